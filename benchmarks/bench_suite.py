@@ -0,0 +1,288 @@
+# Benchmark suite: latency percentiles, throughput and peak memory of the
+# repo's image operators on synthetic images, saved as JSON and compared
+# between runs to catch regressions
+
+import argparse
+import ctypes
+import ctypes.util
+import datetime
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from pathlib import Path
+import numpy as np
+import cv2
+import sys
+
+# allow importing the operators from every assignment folder
+ROOT = Path(__file__).resolve().parent.parent
+for folder in ("image_processing", "image_formation", "feature_detection"):
+    sys.path.append(str(ROOT / folder))
+from median_filter import median_filter
+from calculate_gradient import calculate_gradient
+from sobel_edge_detector import sobel_edge_detector
+from directional_edge_detector import directional_edge_detector
+from equalize_histogram import equalize_histogram
+from contrast_stretch import contrast_stretch
+from calculate_histogram import calculate_histogram
+from geometric_transforms import apply_affine
+from sampling_quantization import quantize
+from extract import SiftExtractor
+from match import make_matcher
+
+# (width, height), VGA to 8K UHD
+SIZES = {
+    "vga": (640, 480),
+    "hd": (1280, 720),
+    "fhd": (1920, 1080),
+    "4k": (3840, 2160),
+    "8k": (7680, 4320),
+}
+
+# largest size a case runs at by default: SIFT's upsampled first octave needs
+# about 2 GB at 4K and over 7 GB at 8K (run with --no-limits to include it)
+MAX_SIZE = {"sift_extract": "4k", "sift_match": "4k"}
+
+# metrics where bigger is worse, checked by `compare`
+TRACKED = ("p50_ms", "p90_ms", "peak_mb", "peak_rss_mb")
+
+def synthetic_image(w: int, h: int, seed: int = 0) -> np.ndarray:
+    # deterministic grayscale scene: smooth shading, hard-edged shapes and
+    # sensor noise, so edge detectors and SIFT see structure, not just noise
+    rng = np.random.default_rng(seed)
+    img = cv2.resize(rng.uniform(40, 200, (9, 16)).astype(np.float32), (w, h), interpolation=cv2.INTER_CUBIC)
+    # shape count grows with the area and shape sizes are in pixels, so
+    # feature density (and SIFT's keypoint count) scales like a real photo's
+    for _ in range(w * h // 4000):
+        x, y = int(rng.integers(w)), int(rng.integers(h))
+        shade = float(rng.uniform(0, 255))
+        if rng.random() < 0.5:
+            cv2.circle(img, (x, y), int(rng.integers(3, 40)), shade, -1)
+        else:
+            dx, dy = (int(v) for v in rng.integers(4, 60, 2))
+            cv2.rectangle(img, (x, y), (x + dx, y + dy), shade, -1)
+    img += rng.normal(0, 6, img.shape).astype(np.float32)
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+def _affine_case(gray):
+    bgr = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+    h, w = gray.shape
+    src = np.array([[0, 0], [w - 1, 0], [0, h - 1]], np.float32)
+    dst = np.array([[0.1 * w, 0.05 * h], [0.9 * w, 0.1 * h], [0.05 * w, 0.85 * h]], np.float32)
+    return lambda: apply_affine(bgr, src, dst)
+
+def _quantize_case(gray):
+    vals = gray.astype(np.float64) / 127.5 - 1.0  # image as a [-1, 1] signal
+    return lambda: quantize(vals, 3, -1.0, 1.0)
+
+def _match_case(gray):
+    # descriptors of the image and of a rotated copy, strongest 2000 each
+    h, w = gray.shape
+    M = cv2.getRotationMatrix2D((w // 2, h // 2), 20, 0.9)
+    warped = cv2.warpAffine(gray, M, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REFLECT)
+    ext = SiftExtractor(top_k=2000)
+    _, d1 = ext.extract(gray)
+    _, d2 = ext.extract(warped)
+    matcher = make_matcher("bf")
+    return lambda: matcher.match(d1, d2)
+
+# name -> setup(gray) returning the zero-argument call that is timed;
+# setup work (color conversion, reference descriptors) is not timed
+CASES = {
+    "median_filter": lambda g: lambda: median_filter(g, 5),
+    "calculate_gradient": lambda g: lambda: calculate_gradient(g),
+    "sobel_edge_detector": lambda g: lambda: sobel_edge_detector(g, 30),
+    "directional_edge_detector": lambda g: lambda: directional_edge_detector(g, (40, 50), 20),
+    "equalize_histogram": lambda g: lambda: equalize_histogram(g),
+    "contrast_stretch": lambda g: lambda: contrast_stretch(g),
+    "calculate_histogram": lambda g: lambda: calculate_histogram(g),
+    "apply_affine": _affine_case,
+    "quantize": _quantize_case,
+    "sift_extract": lambda g: (lambda ext: lambda: ext.extract(g))(SiftExtractor()),
+    "sift_match": _match_case,
+}
+
+def _status_kb(field: str) -> int | None:
+    # VmRSS / VmHWM of this process from /proc (Linux only)
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def _malloc_trim() -> None:
+    # hand freed heap pages back to the OS (glibc), or a call reusing them
+    # would not raise the resident set at all
+    name = ctypes.util.find_library("c")
+    if name:
+        try:
+            ctypes.CDLL(name).malloc_trim(0)
+        except (OSError, AttributeError):
+            pass
+
+def _rss_peak(fn) -> float | None:
+    # resident-set growth of one call in MB, OpenCV's allocations included:
+    # the kernel's high-water mark is reset first (clear_refs 5), then read back
+    _malloc_trim()
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        return None
+    base = _status_kb("VmRSS")
+    fn()
+    peak = _status_kb("VmHWM")
+    return None if base is None or peak is None else max(peak - base, 0) / 1024
+
+def measure(fn, min_repeat: int, max_repeat: int, budget: float) -> dict:
+    # one warm-up call, then at least min_repeat timed calls and more while the
+    # time budget lasts. Memory takes two extra calls: one under tracemalloc
+    # (numpy buffers only) and one for the RSS high-water mark (everything,
+    # Linux only, None elsewhere)
+    fn()
+    samples = []
+    start = time.perf_counter()
+    while len(samples) < max_repeat and (len(samples) < min_repeat or time.perf_counter() - start < budget):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss = _rss_peak(fn)
+    ms = np.array(samples) * 1e3
+    p50, p90, p99 = np.percentile(ms, [50, 90, 99])
+    return {"samples": len(ms), "min_ms": float(ms.min()), "mean_ms": float(ms.mean()),
+            "p50_ms": float(p50), "p90_ms": float(p90), "p99_ms": float(p99), "peak_mb": peak / 2 ** 20,
+            "peak_rss_mb": rss}
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+    except OSError:
+        return None
+    return out.stdout.strip() or None
+
+def environment() -> dict:
+    return {"timestamp": datetime.datetime.now().isoformat(timespec="seconds"), "commit": _git_commit(),
+            "python": platform.python_version(), "numpy": np.__version__, "opencv": cv2.__version__,
+            "machine": platform.machine(), "processor": platform.processor(), "cpus": os.cpu_count(),
+            "opencv_threads": cv2.getNumThreads()}
+
+def run_suite(cases: list[str], sizes: list[str], min_repeat: int = 5, max_repeat: int = 100,
+              budget: float = 1.0, seed: int = 0, limits: bool = True, log=print) -> dict:
+    order = list(SIZES)
+    results = []
+    for size in sizes:
+        w, h = SIZES[size]
+        gray = synthetic_image(w, h, seed)
+        for name in cases:
+            if limits and name in MAX_SIZE and order.index(size) > order.index(MAX_SIZE[name]):
+                if log:
+                    log(f"{name:<26} {size:>4} skipped (above {MAX_SIZE[name]}, see --no-limits)")
+                continue
+            r = {"case": name, "size": size, "width": w, "height": h,
+                 **measure(CASES[name](gray), min_repeat, max_repeat, budget)}
+            r["mpix_per_s"] = w * h / 1e6 / (r["p50_ms"] / 1e3)
+            results.append(r)
+            if log:
+                log(f"{name:<26} {size:>4} {r['p50_ms']:>10.2f} {r['p90_ms']:>10.2f} {r['p99_ms']:>10.2f} "
+                    f"{r['mpix_per_s']:>9.1f} {r['peak_mb']:>9.1f} {_mb(r['peak_rss_mb']):>9}")
+    return {"environment": environment(), "results": results}
+
+def _mb(v) -> str:
+    return "-" if v is None else f"{v:.1f}"
+
+def compare(base: dict, new: dict, threshold: float = 0.10, min_ms: float = 0.05,
+            min_mb: float = 1.0) -> list[dict]:
+    # one row per (case, size, metric) present in both runs; a metric regresses
+    # when it grows by more than `threshold` (relative) and by more than min_ms
+    # / min_mb in absolute terms. A time must also be beyond jitter: even the
+    # fastest new sample has to be slower than the baseline median.
+    old = {(r["case"], r["size"]): r for r in base["results"]}
+    rows = []
+    for r in new["results"]:
+        b = old.get((r["case"], r["size"]))
+        if b is None:
+            continue
+        for metric in TRACKED:
+            before, after = b.get(metric), r.get(metric)
+            if before is None or after is None:
+                continue
+            change = after / before - 1 if before > 0 else 0.0
+            if metric.endswith("_ms"):
+                bad = change > threshold and after - before > min_ms and r["min_ms"] > b["p50_ms"]
+            else:
+                bad = change > threshold and after - before > min_mb
+            rows.append({"case": r["case"], "size": r["size"], "metric": metric, "base": before, "new": after,
+                         "change": change, "regression": bad})
+    return rows
+
+def _size_list(text: str) -> list[str]:
+    sizes = text.split(",")
+    for s in sizes:
+        if s not in SIZES:
+            raise argparse.ArgumentTypeError(f"unknown size: {s} (choose from {', '.join(SIZES)})")
+    return sizes
+
+def _case_list(text: str) -> list[str]:
+    cases = text.split(",")
+    for c in cases:
+        if c not in CASES:
+            raise argparse.ArgumentTypeError(f"unknown case: {c} (choose from {', '.join(CASES)})")
+    return cases
+
+def main():
+    # parse command line arguments
+    ap = argparse.ArgumentParser(description="Benchmark suite with JSON results and regression checks")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("run", help="time every case at every size")
+    r.add_argument("--cases", type=_case_list, default=list(CASES), help="comma-separated cases (default: all)")
+    r.add_argument("--sizes", type=_size_list, default=list(SIZES),
+                   help=f"comma-separated sizes from {', '.join(SIZES)} (default: all)")
+    r.add_argument("--min-repeat", type=int, default=5, help="timed calls per case at least (default: 5)")
+    r.add_argument("--max-repeat", type=int, default=100, help="timed calls per case at most (default: 100)")
+    r.add_argument("--budget", type=float, default=1.0, help="seconds per case beyond min-repeat (default: 1)")
+    r.add_argument("--seed", type=int, default=0, help="synthetic image seed (default: 0)")
+    r.add_argument("--no-limits", action="store_true", help="also run SIFT above 4K (needs > 7 GB at 8K)")
+    r.add_argument("--output", help="save the results as JSON")
+    c = sub.add_parser("compare", help="flag regressions of a run against a baseline")
+    c.add_argument("base", help="baseline JSON")
+    c.add_argument("new", help="JSON to check")
+    c.add_argument("--threshold", type=float, default=0.10, help="relative growth flagged (default: 0.10)")
+    c.add_argument("--min-ms", type=float, default=0.05, help="ignore time changes below this (default: 0.05)")
+    c.add_argument("--min-mb", type=float, default=1.0, help="ignore memory changes below this (default: 1)")
+    args = ap.parse_args()
+
+    if args.cmd == "run":
+        print(f"{'case':<26} {'size':>4} {'p50 (ms)':>10} {'p90 (ms)':>10} {'p99 (ms)':>10} "
+              f"{'MP/s':>9} {'peak (MB)':>9} {'RSS (MB)':>9}")
+        report = run_suite(args.cases, args.sizes, args.min_repeat, args.max_repeat, args.budget, args.seed,
+                           not args.no_limits)
+        if args.output:
+            Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+            Path(args.output).write_text(json.dumps(report, indent=1))
+            print(f"Saved: {args.output}")
+        return
+
+    base, new = (json.loads(Path(p).read_text()) for p in (args.base, args.new))
+    rows = compare(base, new, args.threshold, args.min_ms, args.min_mb)
+    print(f"{'case':<26} {'size':>4} {'metric':<11} {'base':>10} {'new':>10} {'change':>8}")
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['case']:<26} {row['size']:>4} {row['metric']:<11} {row['base']:>10.2f} {row['new']:>10.2f} "
+              f"{row['change']:>+8.1%}{flag}")
+    bad = sum(row["regression"] for row in rows)
+    print(f"{bad} regression(s) over {len(rows)} comparisons (threshold {args.threshold:.0%})")
+    if bad:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
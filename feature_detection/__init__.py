@@ -0,0 +1,25 @@
+# Importable SIFT tools used by the feature_detection notebook
+# Submodules load on first attribute access, so `python -m feature_detection.<module>`
+# runs a module that the package hasn't already imported under its own name.
+
+import importlib
+
+_EXPORTS = {
+    "extract": ("DEFAULT_PARAMS", "KEYPOINT_DTYPE", "SiftExtractor", "array_to_keypoints",
+                "content_hash", "keypoints_to_array", "prune_keypoints"),
+    "match": ("MATCH_DTYPE", "MATCHERS", "BruteForceMatcher", "FlannMatcher", "GemmMatcher", "Matcher",
+              "make_matcher", "to_dmatches", "top_k"),
+    "retrieval": ("RetrievalIndex", "minibatch_kmeans", "quantize"),
+}
+_WHERE = {name: module for module, names in _EXPORTS.items() for name in names}
+__all__ = sorted(_WHERE)
+
+def __getattr__(name):
+    if name not in _WHERE:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_WHERE[name]}", __name__), name)
+    globals()[name] = value  # later lookups skip __getattr__
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,52 @@
+import argparse
+import time
+from pathlib import Path
+import numpy as np
+import sys
+
+# allow sibling imports when run as a script
+sys.path.append(str(Path(__file__).parent))
+from extract import IMAGES_DIR, SiftExtractor
+from match import MATCHERS, make_matcher
+
+def synthetic_descriptors(n: int, rng) -> tuple[np.ndarray, np.ndarray]:
+    # n train descriptors resampled from the example images' real SIFT
+    # descriptors with noise, and n queries that are noisy copies of them
+    ext = SiftExtractor()
+    base = np.vstack([ext.extract_file(p)[1] for p in sorted(IMAGES_DIR.glob("example-image*.jpg"))])
+    train = base[rng.integers(len(base), size=n)] + rng.normal(0, 10, (n, 128))
+    query = train[rng.permutation(n)] + rng.normal(0, 12, (n, 128))
+    clip = lambda d: np.clip(np.rint(d), 0, 255).astype(np.float32)
+    return clip(query), clip(train)
+
+def main():
+    # latency of each matcher and nearest-neighbour recall against the exact answer
+    ap = argparse.ArgumentParser(description="Benchmark descriptor matchers as keypoint counts grow")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000],
+                    help="keypoints per image (default: 1000 5000 20000; try up to 100000)")
+    ap.add_argument("--bf-max", type=int, default=20000, help="skip cv2.BFMatcher above this size (default: 20000)")
+    ap.add_argument("--checks", type=int, default=64, help="FLANN checks (default: 64)")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'n':>7}  {'matcher':<7} {'knn (ms)':>10}  {'recall@1':>8}  {'ratio-test kept':>15}")
+    for n in args.sizes:
+        query, train = synthetic_descriptors(n, rng)
+        # the GEMM matcher is exact, so it is the reference at every size
+        ref = None
+        for name in ["gemm"] + [m for m in MATCHERS if m != "gemm"]:
+            if name == "bf" and n > args.bf_max:
+                continue
+            matcher = make_matcher(name, checks=args.checks) if name == "flann" else make_matcher(name)
+            t0 = time.perf_counter()
+            idx, dist = matcher.knn(query, train, 2)
+            secs = time.perf_counter() - t0
+            if ref is None:
+                ref = idx[:, 0]
+            recall = (idx[:, 0] == ref).mean()
+            kept = (dist[:, 0] < 0.75 * dist[:, 1]).mean()
+            print(f"{n:>7}  {name:<7} {secs * 1e3:>10.1f}  {recall:>8.4f}  {kept:>15.3f}")
+
+if __name__ == "__main__":
+    main()
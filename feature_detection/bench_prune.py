@@ -0,0 +1,55 @@
+import argparse
+import time
+from pathlib import Path
+import numpy as np
+import cv2
+import sys
+
+# allow sibling imports when run as a script
+sys.path.append(str(Path(__file__).parent))
+from extract import DEFAULT_PARAMS, IMAGES_DIR, SiftExtractor
+
+def best_time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def notebook_part3(sift, gray):
+    # as the Part 3 cell does it: detect, describe everything, keep the strongest
+    kps = sift.detect(gray, None)
+    kps, desc = sift.compute(gray, kps)
+    idx = int(np.argmax([kp.response for kp in kps]))
+    return kps[idx], desc[idx]
+
+def main():
+    # pruned extraction (top-K, optional grid NMS), describing all detections in one
+    # pass or only the survivors, vs the notebook's detect + compute
+    ap = argparse.ArgumentParser(description="Benchmark top-K / grid-NMS pruning before SIFT descriptors")
+    ap.add_argument("--k", type=int, nargs="+", default=[1, 50, 200], help="top-K values (default: 1 50 200)")
+    ap.add_argument("--cell", type=float, default=32, help="grid NMS cell in px (default: 32)")
+    ap.add_argument("--repeat", type=int, default=5, help="timing repeats, best is kept (default: 5)")
+    args = ap.parse_args()
+
+    sift = cv2.SIFT_create(**DEFAULT_PARAMS)
+    for path in sorted(IMAGES_DIR.glob("example-image*.jpg")):
+        gray = cv2.imread(str(path), cv2.IMREAD_GRAYSCALE)
+        n = len(sift.detect(gray, None))
+        t_nb = best_time(lambda: notebook_part3(sift, gray), args.repeat)
+        t_all = best_time(lambda: sift.detectAndCompute(gray, None), args.repeat)
+        print(f"{path.name}: {n} detections")
+        print(f"  {'detect + compute all (notebook)':<34} {t_nb * 1e3:8.1f} ms")
+        print(f"  {'detectAndCompute all':<34} {t_all * 1e3:8.1f} ms  {t_nb / t_all:5.2f}x")
+        for k in args.k:
+            for cell, describe in [(None, "all"), (args.cell, "all"), (None, "subset"), (args.cell, "subset")]:
+                ext = SiftExtractor(top_k=k, nms_cell=cell, describe=describe)
+                kps, _ = ext.extract(gray)
+                t = best_time(lambda: ext.extract(gray), args.repeat)
+                label = f"top-{k}" + (f" + nms {cell:g}px" if cell else "") + f" ({describe})"
+                print(f"  {label:<34} {t * 1e3:8.1f} ms  {t_nb / t:5.2f}x  ({len(kps)} kept, "
+                      f"lowest octave {int((kps['octave'].astype(np.int8)).min()) if len(kps) else '-'})")
+
+if __name__ == "__main__":
+    main()
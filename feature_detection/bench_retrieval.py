@@ -0,0 +1,84 @@
+import argparse
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+import cv2
+import sys
+
+# allow sibling imports when run as a script
+sys.path.append(str(Path(__file__).parent))
+from retrieval import RetrievalIndex
+
+REPO = Path(__file__).parent.parent
+SOURCES = ["feature_detection/images/example-image.jpg", "image_formation/images/original_image.jpg",
+           "image_processing/images/low_contrast.jpg"]
+
+def random_view(src: np.ndarray, rng, size=(320, 240)) -> np.ndarray:
+    # random crop (30-60% of each side), rotation and scale of a source image
+    h, w = src.shape
+    ch, cw = int(h * rng.uniform(0.3, 0.6)), int(w * rng.uniform(0.3, 0.6))
+    y, x = rng.integers(0, h - ch), rng.integers(0, w - cw)
+    crop = cv2.resize(src[y:y + ch, x:x + cw], size, interpolation=cv2.INTER_AREA)
+    M = cv2.getRotationMatrix2D((size[0] / 2, size[1] / 2), rng.uniform(-30, 30), rng.uniform(0.8, 1.1))
+    return cv2.warpAffine(crop, M, size, borderMode=cv2.BORDER_REFLECT)
+
+def requery(img: np.ndarray, rng) -> np.ndarray:
+    # a query view of a library image: like the notebook's rotate + scale, plus noise
+    h, w = img.shape
+    M = cv2.getRotationMatrix2D((w / 2, h / 2), rng.uniform(-20, 20), rng.uniform(0.85, 1.0))
+    out = cv2.warpAffine(img, M, (w, h), borderMode=cv2.BORDER_REFLECT).astype(np.float32)
+    return np.clip(out + rng.normal(0, 4, out.shape), 0, 255).astype(np.uint8)
+
+def main():
+    # query latency and top-1 accuracy as a synthetic library grows
+    ap = argparse.ArgumentParser(description="Benchmark the retrieval index against library size")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[100, 300, 1000],
+                    help="library sizes; each step adds images to the same index (default: 100 300 1000)")
+    ap.add_argument("--words", type=int, default=1024, help="vocabulary size (default: 1024)")
+    ap.add_argument("--queries", type=int, default=20, help="queries per size (default: 20)")
+    ap.add_argument("--workers", type=int, help="extraction processes (default: all cores)")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    sources = [cv2.imread(str(REPO / s), cv2.IMREAD_GRAYSCALE) for s in SOURCES]
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        lib, idx = [], None
+        print(f"{'images':>7}  {'add (s)':>8}  {'score (ms)':>10}  {'verified (ms)':>13}  {'top-1':>6}  {'top-1 tf-idf':>12}")
+        for n in sorted(args.sizes):
+            new = []
+            for i in range(len(lib), n):
+                p = tmp / f"lib_{i:06d}.png"
+                cv2.imwrite(str(p), random_view(sources[i % len(sources)], rng))
+                new.append(p)
+            t0 = time.perf_counter()
+            if idx is None:
+                idx = RetrievalIndex.build(tmp / "index", new, args.words, workers=args.workers)
+            else:
+                idx.add(new, args.workers)
+                idx.save()
+            t_add = time.perf_counter() - t0
+            lib += new
+
+            picks = rng.choice(len(lib), min(args.queries, len(lib)), replace=False)
+            t_score = t_verify = 0.0
+            hits = hits_tfidf = 0
+            for j in picks:
+                q = tmp / "query.png"
+                cv2.imwrite(str(q), requery(cv2.imread(str(lib[j]), cv2.IMREAD_GRAYSCALE), rng))
+                t0 = time.perf_counter()
+                fast = idx.query(q, top=1, verify=False)
+                t_score += time.perf_counter() - t0
+                t0 = time.perf_counter()
+                best = idx.query(q, top=1)
+                t_verify += time.perf_counter() - t0
+                hits_tfidf += fast[0][0] == str(lib[j])
+                hits += best[0][0] == str(lib[j])
+            k = len(picks)
+            print(f"{len(lib):>7}  {t_add:>8.2f}  {t_score / k * 1e3:>10.1f}  {t_verify / k * 1e3:>13.1f}  "
+                  f"{hits / k:>6.2f}  {hits_tfidf / k:>12.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+# SIFT extraction with an on-disk keypoint / descriptor cache
+
+import argparse
+import hashlib
+import os
+import time
+from pathlib import Path
+import numpy as np
+import cv2
+
+IMAGES_DIR = Path(__file__).parent / "images"
+
+# one row per keypoint; 24 bytes instead of a cv2.KeyPoint object
+KEYPOINT_DTYPE = np.dtype([("x", "<f4"), ("y", "<f4"), ("size", "<f4"),
+                           ("angle", "<f4"), ("response", "<f4"), ("octave", "<i4")])
+
+# SIFT_create keywords, with edgeThreshold=5 as tuned in Part 2
+DEFAULT_PARAMS = {"nfeatures": 0, "nOctaveLayers": 3, "contrastThreshold": 0.04,
+                  "edgeThreshold": 5, "sigma": 1.6}
+
+def keypoints_to_array(kps) -> np.ndarray:
+    arr = np.empty(len(kps), KEYPOINT_DTYPE)
+    if len(kps):
+        arr["x"], arr["y"] = np.array([kp.pt for kp in kps], np.float32).T
+        arr["size"] = [kp.size for kp in kps]
+        arr["angle"] = [kp.angle for kp in kps]
+        arr["response"] = [kp.response for kp in kps]
+        arr["octave"] = [kp.octave for kp in kps]
+    return arr
+
+def array_to_keypoints(arr: np.ndarray) -> list:
+    # back to cv2.KeyPoint, e.g. for cv2.drawKeypoints / cv2.drawMatches
+    return [cv2.KeyPoint(float(r["x"]), float(r["y"]), float(r["size"]), float(r["angle"]),
+                         float(r["response"]), int(r["octave"])) for r in arr]
+
+def prune_keypoints(kps: np.ndarray, top_k: int | None = None, cell: float | None = None) -> np.ndarray:
+    # indices of the keypoints to keep, strongest first: with `cell`, only the
+    # strongest keypoint in each cell x cell px square survives (grid NMS);
+    # then the top_k by response
+    idx = np.arange(len(kps))
+    if cell and len(kps):
+        gx = (kps["x"] // cell).astype(np.int64)
+        gy = (kps["y"] // cell).astype(np.int64)
+        cid = gy * (gx.max() + 1) + gx
+        order = np.lexsort((-kps["response"], cid))
+        first = np.ones(len(order), bool)
+        first[1:] = cid[order[1:]] != cid[order[:-1]]
+        idx = order[first]
+    idx = np.sort(idx)
+    if top_k is not None and top_k < len(idx):
+        # everything above the k-th largest response, then ties in index order
+        r = -kps["response"][idx]
+        kth = np.partition(r, top_k - 1)[top_k - 1]
+        above = np.flatnonzero(r < kth)
+        idx = idx[np.sort(np.concatenate([above, np.flatnonzero(r == kth)[:top_k - len(above)]]))]
+    return idx[np.argsort(-kps["response"][idx], kind="stable")]
+
+def content_hash(data) -> str:
+    # digest of raw bytes (an encoded file) or of a decoded image with its layout
+    h = hashlib.blake2b(digest_size=16)
+    if isinstance(data, np.ndarray):
+        h.update(f"{data.shape}{data.dtype.str}".encode())
+        data = memoryview(np.ascontiguousarray(data)).cast("B")
+    h.update(data)
+    return h.hexdigest()
+
+class SiftExtractor:
+    # cv2.SIFT wrapper; with a cache_dir every result is stored as
+    # <key>.kp.npy (KEYPOINT_DTYPE) and <key>.desc.npy, where the key is the
+    # image content hash plus the SIFT parameters, and is memory-mapped back
+    # on later calls instead of being recomputed. With top_k / nms_cell only
+    # the prune_keypoints survivors are kept: describe="all" prunes after one
+    # detectAndCompute pass, describe="subset" runs detect, prunes, and
+    # computes descriptors for the survivors only.
+    def __init__(self, cache_dir=None, descriptor_dtype="float32", top_k: int | None = None,
+                 nms_cell: float | None = None, describe: str = "all", **params):
+        unknown = set(params) - set(DEFAULT_PARAMS)
+        if unknown:
+            raise ValueError(f"unknown SIFT parameters: {sorted(unknown)}")
+        self.params = {**DEFAULT_PARAMS, **params}
+        self.descriptor_dtype = np.dtype(descriptor_dtype)
+        if self.descriptor_dtype not in (np.float32, np.uint8):
+            raise ValueError("descriptor_dtype must be float32 or uint8")
+        if top_k is not None and top_k < 1:
+            raise ValueError("top_k must be positive")
+        if describe not in ("all", "subset"):
+            raise ValueError("describe must be 'all' or 'subset'")
+        self.top_k, self.nms_cell, self.describe = top_k, nms_cell, describe
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._sift = None
+
+    @property
+    def sift(self):
+        # built on first use, so a fully cached run never creates it
+        if self._sift is None:
+            self._sift = cv2.SIFT_create(**self.params)
+        return self._sift
+
+    def key(self, digest: str) -> str:
+        # numbers are keyed as floats so edgeThreshold=5 and 5.0 share a cache entry
+        spec = ",".join(f"{k}={float(v)!r}" for k, v in sorted(self.params.items()))
+        spec += f",desc={self.descriptor_dtype.str}"
+        if self.top_k is not None or self.nms_cell:
+            nms = float(self.nms_cell) if self.nms_cell else None
+            spec += f",top_k={self.top_k},nms_cell={nms},describe={self.describe}"
+        return hashlib.blake2b(f"{digest}|{spec}".encode(), digest_size=16).hexdigest()
+
+    def _paths(self, key: str) -> tuple[Path, Path]:
+        return self.cache_dir / f"{key}.kp.npy", self.cache_dir / f"{key}.desc.npy"
+
+    def _load(self, key: str):
+        kp_path, desc_path = self._paths(key)
+        if not (kp_path.exists() and desc_path.exists()):
+            return None
+        # an empty file can't be memory-mapped
+        load = lambda p: np.load(p, mmap_mode="r") if p.stat().st_size > 128 else np.load(p)
+        return load(kp_path), load(desc_path)
+
+    def _store(self, key: str, kps: np.ndarray, desc: np.ndarray) -> None:
+        # write to temp names and rename, so a concurrent reader never sees half a file
+        for path, arr in zip(self._paths(key), (kps, desc)):
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            with open(tmp, "wb") as f:
+                np.save(f, arr)
+            os.replace(tmp, path)
+
+    def _compute(self, gray: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        pruned = self.top_k is not None or bool(self.nms_cell)
+        if pruned and self.describe == "subset":
+            # compute() rebuilds the scale-space pyramid, starting from the
+            # lowest octave the survivors need, so this only pays off when
+            # descriptors dominate (very many detections) or the survivors
+            # skip the upsampled octave
+            kps = self.sift.detect(gray, None)
+            keep = prune_keypoints(keypoints_to_array(kps), self.top_k, self.nms_cell)
+            kps, desc = self.sift.compute(gray, [kps[i] for i in keep]) if len(keep) else ([], None)
+            arr = keypoints_to_array(kps)
+        else:
+            kps, desc = self.sift.detectAndCompute(gray, None)
+            arr = keypoints_to_array(kps)
+            if pruned and len(arr):
+                keep = prune_keypoints(arr, self.top_k, self.nms_cell)
+                arr, desc = arr[keep], desc[keep]
+        if desc is None:
+            desc = np.empty((0, 128), np.float32)
+        # SIFT descriptor entries are whole numbers in [0, 255], so uint8 is lossless
+        return arr, desc.astype(self.descriptor_dtype)
+
+    def _cached(self, digest: str, compute) -> tuple[np.ndarray, np.ndarray]:
+        if self.cache_dir is None:
+            self.misses += 1
+            return compute()
+        key = self.key(digest)
+        entry = self._load(key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        kps, desc = compute()
+        self._store(key, kps, desc)
+        return kps, desc
+
+    def extract(self, gray: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        # (keypoints as KEYPOINT_DTYPE, descriptors (N, 128)) for a grayscale image
+        if gray.ndim != 2:
+            raise ValueError("expected a grayscale image")
+        return self._cached(content_hash(gray) if self.cache_dir else "", lambda: self._compute(gray))
+
+    def _compute_file(self, path: Path) -> tuple[np.ndarray, np.ndarray]:
+        gray = cv2.imread(str(path), cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            raise FileNotFoundError(f"Could not read image: {path}")
+        return self._compute(gray)
+
+    def extract_file(self, path) -> tuple[np.ndarray, np.ndarray]:
+        # keyed on the file bytes, so a cache hit skips decoding as well
+        path = Path(path)
+        return self._cached(content_hash(path.read_bytes()) if self.cache_dir else "",
+                            lambda: self._compute_file(path))
+
+    def cache_file(self, path) -> str:
+        # make sure `path` is cached and return its key, without loading the arrays
+        if self.cache_dir is None:
+            raise ValueError("cache_file needs a cache_dir")
+        path = Path(path)
+        key = self.key(content_hash(path.read_bytes()))
+        if all(p.exists() for p in self._paths(key)):
+            self.hits += 1
+        else:
+            self.misses += 1
+            self._store(key, *self._compute_file(path))
+        return key
+
+    def load(self, key: str) -> tuple[np.ndarray, np.ndarray]:
+        # memory-mapped (keypoints, descriptors) of a cached entry
+        entry = self._load(key) if self.cache_dir is not None else None
+        if entry is None:
+            raise KeyError(f"no cached SIFT entry {key}")
+        return entry
+
+def main():
+    # parse command line arguments
+    ap = argparse.ArgumentParser(description="Extract (and cache) SIFT keypoints and descriptors")
+    ap.add_argument("--input", nargs="+", default=[str(IMAGES_DIR / "example-image.jpg"),
+                                                   str(IMAGES_DIR / "example-image-transformed.jpg")],
+                    help="image files (default: the two example images)")
+    ap.add_argument("--cache-dir", default=str(Path(__file__).parent / ".sift_cache"),
+                    help="where keypoint/descriptor .npy files are kept")
+    ap.add_argument("--uint8", action="store_true", help="store descriptors as uint8 instead of float32")
+    ap.add_argument("--contrast-threshold", type=float, default=DEFAULT_PARAMS["contrastThreshold"])
+    ap.add_argument("--edge-threshold", type=float, default=DEFAULT_PARAMS["edgeThreshold"])
+    ap.add_argument("--top-k", type=int, help="optional: keep only the K strongest keypoints")
+    ap.add_argument("--nms-cell", type=float, help="optional: keep the strongest keypoint per cell (px)")
+    ap.add_argument("--describe", choices=["all", "subset"], default="all",
+                    help="with pruning: describe all detections in one pass, or only the survivors")
+    args = ap.parse_args()
+
+    ext = SiftExtractor(args.cache_dir, np.uint8 if args.uint8 else np.float32, args.top_k, args.nms_cell,
+                        args.describe, contrastThreshold=args.contrast_threshold,
+                        edgeThreshold=args.edge_threshold)
+    t0 = time.perf_counter()
+    for path in args.input:
+        kps, desc = ext.extract_file(path)
+        print(f"{Path(path).name:<40} {len(kps):>6} keypoints  descriptors {desc.dtype}")
+    print(f"hits={ext.hits}  misses={ext.misses}  time={(time.perf_counter() - t0) * 1e3:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+# Descriptor matchers: OpenCV brute force, FLANN KD-tree and a blocked-GEMM exact search
+
+import argparse
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+import numpy as np
+import cv2
+import sys
+
+if __package__:
+    from .extract import IMAGES_DIR, SiftExtractor, array_to_keypoints
+else:
+    # run as a file path: allow `from extract import SiftExtractor`
+    sys.path.append(str(Path(__file__).parent))
+    from extract import IMAGES_DIR, SiftExtractor, array_to_keypoints
+
+# one row per match, like cv2.DMatch (queryIdx, trainIdx, distance)
+MATCH_DTYPE = np.dtype([("query", "<i4"), ("train", "<i4"), ("distance", "<f4")])
+
+class Matcher(ABC):
+    # subclasses implement knn(); ratio test, cross-check and top-k are shared
+    name = "base"
+
+    @abstractmethod
+    def knn(self, query: np.ndarray, train: np.ndarray, k: int = 2) -> tuple[np.ndarray, np.ndarray]:
+        # (indices, distances), both (len(query), k), nearest first
+        ...
+
+    def match(self, query: np.ndarray, train: np.ndarray, ratio: float | None = 0.75,
+              cross_check: bool = False) -> np.ndarray:
+        # nearest neighbour per query, kept if it passes Lowe's ratio test
+        # (d1 < ratio * d2) and, with cross_check, if it is also mutual
+        if len(query) == 0 or len(train) == 0:
+            return np.empty(0, MATCH_DTYPE)
+        k = 2 if ratio is not None and len(train) > 1 else 1
+        idx, dist = self.knn(query, train, k)
+        keep = idx[:, 0] >= 0
+        if k == 2:
+            keep &= dist[:, 0] < ratio * dist[:, 1]
+        if cross_check:
+            back, _ = self.knn(train, query, 1)
+            keep &= back[idx[:, 0], 0] == np.arange(len(query))
+        out = np.empty(int(keep.sum()), MATCH_DTYPE)
+        out["query"] = np.flatnonzero(keep)
+        out["train"] = idx[keep, 0]
+        out["distance"] = dist[keep, 0]
+        return out
+
+class BruteForceMatcher(Matcher):
+    # cv2.BFMatcher with L2, as in the notebook
+    name = "bf"
+
+    def knn(self, query, train, k=2):
+        pairs = cv2.BFMatcher(cv2.NORM_L2).knnMatch(_f32(query), _f32(train), k=k)
+        return _from_dmatches(pairs, len(query), k)
+
+class FlannMatcher(Matcher):
+    # randomized KD-trees; approximate, `checks` trades recall for speed
+    name = "flann"
+
+    def __init__(self, trees: int = 4, checks: int = 64):
+        self.trees, self.checks = trees, checks
+
+    def knn(self, query, train, k=2):
+        flann = cv2.FlannBasedMatcher({"algorithm": 1, "trees": self.trees}, {"checks": self.checks})
+        pairs = flann.knnMatch(_f32(query), _f32(train), k=k)
+        return _from_dmatches(pairs, len(query), k)
+
+class GemmMatcher(Matcher):
+    # exact search: |q - t|^2 = |q|^2 + |t|^2 - 2 q.t, one matrix product per
+    # block of queries so the distance matrix never exceeds block x len(train)
+    name = "gemm"
+
+    def __init__(self, block: int = 2048):
+        self.block = block
+
+    def knn(self, query, train, k=2):
+        q, t = _f32(query), _f32(train)
+        k = min(k, len(t))
+        t_sq = np.einsum("ij,ij->i", t, t)
+        idx = np.empty((len(q), k), np.intp)
+        dist = np.empty((len(q), k), np.float32)
+        for i0 in range(0, len(q), self.block):
+            qb = q[i0:i0 + self.block]
+            d2 = qb @ t.T
+            d2 *= -2
+            d2 += t_sq
+            d2 += np.einsum("ij,ij->i", qb, qb)[:, None]
+            nn = np.argpartition(d2, k - 1, axis=1)[:, :k] if k < len(t) else np.tile(np.arange(k), (len(qb), 1))
+            nd = np.take_along_axis(d2, nn, axis=1)
+            order = np.argsort(nd, axis=1)
+            idx[i0:i0 + len(qb)] = np.take_along_axis(nn, order, axis=1)
+            dist[i0:i0 + len(qb)] = np.sqrt(np.maximum(np.take_along_axis(nd, order, axis=1), 0))
+        return idx, dist
+
+MATCHERS = {"bf": BruteForceMatcher, "flann": FlannMatcher, "gemm": GemmMatcher}
+
+def make_matcher(name: str, **kwargs) -> Matcher:
+    if name not in MATCHERS:
+        raise ValueError(f"unknown matcher: {name} (choose from {', '.join(MATCHERS)})")
+    return MATCHERS[name](**kwargs)
+
+def _f32(d: np.ndarray) -> np.ndarray:
+    return np.ascontiguousarray(d, dtype=np.float32)
+
+def _from_dmatches(pairs, n: int, k: int) -> tuple[np.ndarray, np.ndarray]:
+    # list of DMatch lists -> padded arrays (-1 / inf where fewer than k were found)
+    idx = np.full((n, k), -1, np.intp)
+    dist = np.full((n, k), np.inf, np.float32)
+    for m in pairs:
+        for j, dm in enumerate(m[:k]):
+            idx[dm.queryIdx, j] = dm.trainIdx
+            dist[dm.queryIdx, j] = dm.distance
+    return idx, dist
+
+def top_k(matches: np.ndarray, k: int) -> np.ndarray:
+    # the k lowest-distance matches, sorted; O(n) selection instead of a full sort
+    if k < 0:
+        raise ValueError(f"k must be non-negative, got {k}")
+    if k == 0:
+        return matches[:0]
+    if k >= len(matches):
+        return np.sort(matches, order="distance")
+    best = np.argpartition(matches["distance"], k - 1)[:k]
+    return matches[best[np.argsort(matches["distance"][best], kind="stable")]]
+
+def to_dmatches(matches: np.ndarray) -> list:
+    # for cv2.drawMatches
+    return [cv2.DMatch(int(m["query"]), int(m["train"]), float(m["distance"])) for m in matches]
+
+def main():
+    # Part 4 with a selectable matcher: match the example images and save the top matches
+    ap = argparse.ArgumentParser(description="Match SIFT features between two images")
+    ap.add_argument("--matcher", choices=list(MATCHERS), default="gemm")
+    ap.add_argument("--ratio", type=float, default=0.75, help="Lowe ratio, 0 disables the test (default: 0.75)")
+    ap.add_argument("--cross-check", action="store_true", help="keep only mutual nearest neighbours")
+    ap.add_argument("--top", type=int, default=50, help="matches to draw (default: 50)")
+    ap.add_argument("--img1", default=str(IMAGES_DIR / "example-image.jpg"))
+    ap.add_argument("--img2", default=str(IMAGES_DIR / "example-image-transformed.jpg"))
+    ap.add_argument("--output", help="optional: save the match visualization here")
+    ap.add_argument("--cache-dir", help="optional SiftExtractor cache directory")
+    args = ap.parse_args()
+
+    ext = SiftExtractor(args.cache_dir)
+    kp1, des1 = ext.extract_file(args.img1)
+    kp2, des2 = ext.extract_file(args.img2)
+    matcher = make_matcher(args.matcher)
+    t0 = time.perf_counter()
+    matches = matcher.match(des1, des2, args.ratio or None, args.cross_check)
+    secs = time.perf_counter() - t0
+    best = top_k(matches, args.top)
+    print(f"{matcher.name}: {len(des1)} x {len(des2)} descriptors -> {len(matches)} matches "
+          f"in {secs * 1e3:.2f} ms")
+
+    if args.output:
+        img1 = cv2.imread(args.img1, cv2.IMREAD_COLOR)
+        img2 = cv2.imread(args.img2, cv2.IMREAD_COLOR)
+        vis = cv2.drawMatches(img1, array_to_keypoints(kp1), img2, array_to_keypoints(kp2),
+                              to_dmatches(best), None, flags=cv2.DrawMatchesFlags_NOT_DRAW_SINGLE_POINTS)
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        cv2.imwrite(args.output, vis)
+        print(f"Saved: {args.output}")
+
+if __name__ == "__main__":
+    main()
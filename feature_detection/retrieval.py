@@ -0,0 +1,255 @@
+# Image retrieval over cached SIFT descriptors: bag of visual words, inverted
+# file with TF-IDF scoring, and geometric verification of the shortlist
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+import cv2
+import sys
+
+if __package__:
+    from .extract import SiftExtractor
+    from .match import GemmMatcher
+else:
+    # run as a file path: allow sibling imports
+    sys.path.append(str(Path(__file__).parent))
+    from extract import SiftExtractor
+    from match import GemmMatcher
+
+# descriptors quantized per GEMM block
+_QUANT_BLOCK = 4096
+
+def minibatch_kmeans(data: np.ndarray, k: int, batch: int = 2048, iters: int = 100,
+                     seed: int = 0) -> np.ndarray:
+    # mini-batch k-means: each step assigns a random batch to its nearest
+    # centre and moves every centre towards its batch mean with rate
+    # (points in batch) / (points seen so far)
+    rng = np.random.default_rng(seed)
+    if len(data) < k:
+        raise ValueError(f"need at least {k} descriptors for {k} words, got {len(data)}")
+    centers = np.array(data[rng.choice(len(data), k, replace=False)], np.float32)
+    seen = np.zeros(k)
+    nn = GemmMatcher()
+    for _ in range(iters):
+        b = np.asarray(data[rng.integers(len(data), size=min(batch, len(data)))], np.float32)
+        assign = nn.knn(b, centers, 1)[0][:, 0]
+        n = np.bincount(assign, minlength=k)
+        sums = np.zeros_like(centers)
+        np.add.at(sums, assign, b)
+        seen += n
+        hit = n > 0
+        centers[hit] += (sums[hit] - n[hit, None] * centers[hit]) / seen[hit, None]
+    return centers
+
+def quantize(desc: np.ndarray, vocab: np.ndarray) -> np.ndarray:
+    # nearest visual word per descriptor
+    return GemmMatcher(_QUANT_BLOCK).knn(desc, vocab, 1)[0][:, 0].astype(np.int32)
+
+def _cache_worker(args):
+    # runs in a pool process: extract (or find) one image in the shared cache
+    cache_dir, params, path = args
+    return SiftExtractor(cache_dir, **params).cache_file(path)
+
+class RetrievalIndex:
+    # on-disk layout under `root`:
+    #   vocab.npy                      (k, 128) visual words
+    #   images.json                    path + SIFT cache key per image
+    #   fwd_ptr/fwd_words/fwd_counts   per-image word histograms (CSR)
+    #   inv_ptr/inv_images/inv_tf      inverted file: postings per word (CSR)
+    #   norms.npy                      TF-IDF vector length per image
+    #   sift/                          SiftExtractor cache used for verification
+    # everything is opened with mmap_mode="r"; add() appends images and
+    # save() rebuilds the inverted file from the forward histograms
+    ARRAYS = ("fwd_ptr", "fwd_words", "fwd_counts", "inv_ptr", "inv_images", "inv_tf", "norms")
+
+    def __init__(self, root, vocab: np.ndarray | None = None, **sift_params):
+        self.root = Path(root)
+        self.sift_params = sift_params
+        self.extractor = SiftExtractor(self.root / "sift", **sift_params)
+        self.vocab = vocab
+        self.images: list[dict] = []
+        self.fwd_ptr = np.zeros(1, np.int64)
+        self.fwd_words = np.empty(0, np.int32)
+        self.fwd_counts = np.empty(0, np.float32)
+        self._dirty = True
+
+    @classmethod
+    def open(cls, root) -> "RetrievalIndex":
+        root = Path(root)
+        meta = json.loads((root / "images.json").read_text())
+        idx = cls(root, np.load(root / "vocab.npy"), **meta["sift_params"])
+        idx.images = meta["images"]
+        for name in cls.ARRAYS:
+            setattr(idx, name, np.load(root / f"{name}.npy", mmap_mode="r"))
+        idx._dirty = False
+        return idx
+
+    @classmethod
+    def build(cls, root, paths, words: int = 1024, sample: int = 200_000, workers: int | None = None,
+              seed: int = 0, **sift_params) -> "RetrievalIndex":
+        # extract everything, train the vocabulary on a sample of descriptors, index
+        idx = cls(root, **sift_params)
+        keys = idx._cache(paths, workers)
+        rng = np.random.default_rng(seed)
+        descs = [idx.extractor.load(k)[1] for k in keys]
+        total = sum(len(d) for d in descs)
+        take = rng.random(total) < min(1.0, sample / max(total, 1))
+        pool = np.vstack(descs)[take] if total else np.empty((0, 128), np.float32)
+        idx.vocab = minibatch_kmeans(pool, words, seed=seed)
+        idx._index(paths, keys)
+        idx.save()
+        return idx
+
+    def __len__(self) -> int:
+        return len(self.images)
+
+    def _cache(self, paths, workers) -> list[str]:
+        # SIFT extraction is the expensive part; spread it over processes
+        paths = [str(p) for p in paths]
+        if workers == 1 or len(paths) < 2:
+            return [self.extractor.cache_file(p) for p in paths]
+        jobs = [(str(self.extractor.cache_dir), self.sift_params, p) for p in paths]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(_cache_worker, jobs, chunksize=max(1, len(jobs) // (4 * (os.cpu_count() or 1)))))
+
+    def _index(self, paths, keys) -> None:
+        ptr, words, counts = [self.fwd_ptr[-1]], [], []
+        for p, key in zip(paths, keys):
+            w, c = np.unique(quantize(self.extractor.load(key)[1], self.vocab), return_counts=True)
+            words.append(w)
+            counts.append(c.astype(np.float32))
+            ptr.append(ptr[-1] + len(w))
+            self.images.append({"path": str(p), "key": key})
+        self.fwd_ptr = np.concatenate([self.fwd_ptr, np.array(ptr[1:], np.int64)])
+        self.fwd_words = np.concatenate([self.fwd_words, *words]).astype(np.int32)
+        self.fwd_counts = np.concatenate([self.fwd_counts, *counts]).astype(np.float32)
+        self._dirty = True
+
+    def add(self, paths, workers: int | None = None) -> None:
+        # incremental: new images are quantized against the existing vocabulary
+        if self.vocab is None:
+            raise ValueError("index has no vocabulary; use RetrievalIndex.build first")
+        self._index(paths, self._cache(paths, workers))
+
+    def _rebuild(self) -> None:
+        # inverted file = the forward histograms sorted by word; tf is the
+        # word count over the image's total, weighted by idf at query time
+        n_img = len(self.images)
+        img_of = np.repeat(np.arange(n_img, dtype=np.int32), np.diff(self.fwd_ptr))
+        totals = np.bincount(img_of, weights=self.fwd_counts, minlength=n_img)
+        tf = self.fwd_counts / totals[img_of]
+        order = np.argsort(self.fwd_words, kind="stable")
+        self.inv_images = img_of[order]
+        self.inv_tf = tf[order].astype(np.float32)
+        df = np.bincount(self.fwd_words, minlength=len(self.vocab))
+        self.inv_ptr = np.concatenate([[0], np.cumsum(df)]).astype(np.int64)
+        w = (tf * self.idf()[self.fwd_words]) ** 2
+        self.norms = np.sqrt(np.bincount(img_of, weights=w, minlength=n_img)).astype(np.float32)
+        self._dirty = False
+
+    def idf(self) -> np.ndarray:
+        df = np.diff(self.inv_ptr) if not self._dirty else np.bincount(self.fwd_words, minlength=len(self.vocab))
+        return np.log((len(self.images) + 1) / (df + 1)).astype(np.float32)
+
+    def save(self) -> None:
+        if self._dirty:
+            self._rebuild()
+        self.root.mkdir(parents=True, exist_ok=True)
+        np.save(self.root / "vocab.npy", self.vocab)
+        for name in self.ARRAYS:
+            tmp = self.root / f"{name}.tmp.npy"
+            np.save(tmp, np.asarray(getattr(self, name)))
+            os.replace(tmp, self.root / f"{name}.npy")
+        meta = {"sift_params": self.sift_params, "images": self.images}
+        (self.root / "images.json").write_text(json.dumps(meta))
+        # reopen the arrays memory-mapped
+        for name in self.ARRAYS:
+            setattr(self, name, np.load(self.root / f"{name}.npy", mmap_mode="r"))
+
+    def scores(self, desc: np.ndarray) -> np.ndarray:
+        # cosine similarity of TF-IDF vectors, touching only the postings of
+        # the query's words
+        if self._dirty:
+            self._rebuild()
+        words, counts = np.unique(quantize(desc, self.vocab), return_counts=True)
+        idf = self.idf()[words]
+        q = counts / max(counts.sum(), 1) * idf
+        starts, lens = self.inv_ptr[words], np.diff(self.inv_ptr)[words]
+        # positions of every posting of every query word, without a Python loop
+        pos = np.arange(lens.sum()) + np.repeat(starts - np.cumsum(lens) + lens, lens)
+        contrib = self.inv_tf[pos] * np.repeat(q * idf, lens)
+        s = np.bincount(self.inv_images[pos], weights=contrib, minlength=len(self.images))
+        qn = np.sqrt((q ** 2).sum())
+        return s / np.maximum(self.norms * qn, 1e-12)
+
+    def query(self, path, shortlist: int = 20, top: int = 5, verify: bool = True,
+              ratio: float = 0.8, threshold: float = 5.0) -> list[tuple[str, float, int]]:
+        # (path, tf-idf score, inliers) for the best `top` images; with verify,
+        # the shortlist is re-ranked by RANSAC affine inliers
+        # queries are not added to the index's SIFT cache
+        kps, desc = SiftExtractor(None, **self.sift_params).extract_file(path)
+        s = self.scores(desc)
+        k = min(shortlist, len(s))
+        cand = np.argpartition(-s, k - 1)[:k] if k < len(s) else np.arange(len(s))
+        cand = cand[np.argsort(-s[cand], kind="stable")]
+        results = []
+        for i in cand:
+            inliers = self.verify(kps, desc, self.images[i]["key"], ratio, threshold) if verify else 0
+            results.append((self.images[i]["path"], float(s[i]), inliers))
+        if verify:
+            results.sort(key=lambda r: (-r[2], -r[1]))
+        return results[:top]
+
+    def verify(self, kps, desc, key: str, ratio: float = 0.8, threshold: float = 5.0) -> int:
+        # inliers of an affine fitted to ratio-test matches (0 if too few)
+        ref_kps, ref_desc = self.extractor.load(key)
+        m = GemmMatcher().match(desc, ref_desc, ratio)
+        if len(m) < 3:
+            return 0
+        src = np.stack([kps["x"][m["query"]], kps["y"][m["query"]]], axis=1)
+        dst = np.stack([ref_kps["x"][m["train"]], ref_kps["y"][m["train"]]], axis=1)
+        M, inl = cv2.estimateAffine2D(src, dst, ransacReprojThreshold=threshold)
+        return int(inl.sum()) if M is not None else 0
+
+def main():
+    # parse command line arguments
+    ap = argparse.ArgumentParser(description="Build / extend / query a SIFT retrieval index")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="train a vocabulary and index images")
+    b.add_argument("--index", required=True, help="index directory")
+    b.add_argument("--images", nargs="+", required=True, help="reference images")
+    b.add_argument("--words", type=int, default=1024, help="vocabulary size (default: 1024)")
+    b.add_argument("--workers", type=int, help="extraction processes (default: all cores)")
+    a = sub.add_parser("add", help="add images to an existing index")
+    a.add_argument("--index", required=True)
+    a.add_argument("--images", nargs="+", required=True)
+    a.add_argument("--workers", type=int)
+    q = sub.add_parser("query", help="find the best matching reference images")
+    q.add_argument("--index", required=True)
+    q.add_argument("--image", required=True)
+    q.add_argument("--shortlist", type=int, default=20, help="candidates to verify (default: 20)")
+    q.add_argument("--top", type=int, default=5)
+    q.add_argument("--no-verify", action="store_true", help="rank by TF-IDF score only")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    if args.cmd == "build":
+        idx = RetrievalIndex.build(args.index, args.images, args.words, workers=args.workers)
+        print(f"Indexed {len(idx)} images, {len(idx.vocab)} words in {time.perf_counter() - t0:.2f} s")
+    elif args.cmd == "add":
+        idx = RetrievalIndex.open(args.index)
+        idx.add(args.images, args.workers)
+        idx.save()
+        print(f"Index now holds {len(idx)} images ({time.perf_counter() - t0:.2f} s)")
+    else:
+        idx = RetrievalIndex.open(args.index)
+        for path, score, inliers in idx.query(args.image, args.shortlist, args.top, not args.no_verify):
+            print(f"{score:8.4f}  {inliers:5d}  {path}")
+        print(f"query: {(time.perf_counter() - t0) * 1e3:.1f} ms")
+
+if __name__ == "__main__":
+    main()
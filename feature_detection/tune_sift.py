@@ -0,0 +1,172 @@
+# Part 2 as a measurement: run a grid of SIFT parameters in a process pool and
+# score each setting by speed, keypoint count and repeatability under the
+# notebook's kind of rotate + scale transform
+
+import argparse
+import csv
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+import cv2
+import sys
+
+if __package__:
+    from .extract import DEFAULT_PARAMS, IMAGES_DIR, SiftExtractor
+    from .match import GemmMatcher
+else:
+    # run as a file path: allow sibling imports
+    sys.path.append(str(Path(__file__).parent))
+    from extract import DEFAULT_PARAMS, IMAGES_DIR, SiftExtractor
+    from match import GemmMatcher
+
+# (angle in degrees, scale); the first is the notebook's Part 4 transform
+TRANSFORMS = [(20, 0.9), (45, 1.0), (90, 1.0), (0, 0.7), (10, 1.3)]
+
+COLUMNS = ["nfeatures", "nOctaveLayers", "contrastThreshold", "edgeThreshold", "sigma",
+           "keypoints", "extract_ms", "repeatability", "matching_score", "worst_repeatability"]
+
+def warp_pair(gray: np.ndarray, angle: float, scale: float) -> tuple[np.ndarray, np.ndarray]:
+    # transformed copy exactly as the notebook makes it, and its matrix
+    h, w = gray.shape
+    M = cv2.getRotationMatrix2D((w // 2, h // 2), angle, scale)
+    return cv2.warpAffine(gray, M, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REFLECT), M
+
+def _project(M: np.ndarray, xy: np.ndarray) -> np.ndarray:
+    return xy @ M[:, :2].T + M[:, 2]
+
+def _inside(xy: np.ndarray, shape) -> np.ndarray:
+    h, w = shape
+    return (xy[:, 0] >= 0) & (xy[:, 0] <= w - 1) & (xy[:, 1] >= 0) & (xy[:, 1] <= h - 1)
+
+def _nearest_sq(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # squared distance from each point of a to its nearest point of b; the
+    # search is GemmMatcher's blocked one (no len(a) x len(b) matrix), on
+    # coordinates centred on b so float32 keeps sub-pixel precision, and the
+    # winner's distance is recomputed in float64
+    c = b.mean(axis=0)
+    nn, _ = GemmMatcher().knn(a - c, b - c, 1)
+    return ((a - b[nn[:, 0]]) ** 2).sum(-1)
+
+def pair_scores(kp1, desc1, kp2, desc2, M, shape, eps: float = 2.5,
+                ratio: float = 0.8) -> tuple[float, float]:
+    # repeatability: share of keypoints (seen in both views) that land within
+    # eps px of a keypoint in the other view; matching score: share whose
+    # ratio-test match is the geometrically correct one
+    xy1 = np.stack([kp1["x"], kp1["y"]], axis=1).astype(np.float64)
+    xy2 = np.stack([kp2["x"], kp2["y"]], axis=1).astype(np.float64)
+    Minv = cv2.invertAffineTransform(M)
+    p1 = _project(M, xy1)
+    v1 = _inside(p1, shape)
+    v2 = _inside(_project(Minv, xy2), shape)
+    n = min(v1.sum(), v2.sum())
+    if n == 0:
+        return 0.0, 0.0
+    a, b = p1[v1], xy2[v2]
+    repeated = min((_nearest_sq(a, b) <= eps ** 2).sum(), (_nearest_sq(b, a) <= eps ** 2).sum())
+    m = GemmMatcher().match(desc1, desc2, ratio)
+    m = m[v1[m["query"]]]
+    correct = ((p1[m["query"]] - xy2[m["train"]]) ** 2).sum(-1) <= eps ** 2
+    return repeated / n, correct.sum() / n
+
+def _evaluate(job):
+    # runs in a pool process: one parameter setting over every image and transform
+    params, paths, transforms, repeat, eps = job
+    ext = SiftExtractor(**params)
+    kps, secs, rep, ms = 0, 0.0, [], []
+    for path in paths:
+        gray = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        best = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            kp1, desc1 = ext.extract(gray)
+            best = min(best, time.perf_counter() - t0)
+        kps += len(kp1)
+        secs += best
+        for angle, scale in transforms:
+            warped, M = warp_pair(gray, angle, scale)
+            kp2, desc2 = ext.extract(warped)
+            r, s = pair_scores(kp1, desc1, kp2, desc2, M, gray.shape, eps)
+            rep.append(r)
+            ms.append(s)
+    return {**params, "keypoints": kps / len(paths), "extract_ms": secs / len(paths) * 1e3,
+            "repeatability": float(np.mean(rep)), "matching_score": float(np.mean(ms)),
+            "worst_repeatability": float(np.min(rep))}
+
+def parameter_grid(**axes) -> list[dict]:
+    # every combination of the given SIFT_create keyword values
+    names = list(axes)
+    return [{**DEFAULT_PARAMS, **dict(zip(names, values))} for values in itertools.product(*axes.values())]
+
+def tune(grid: list[dict], paths, transforms=TRANSFORMS, workers: int | None = None, repeat: int = 3,
+         eps: float = 2.5) -> list[dict]:
+    jobs = [(params, [str(p) for p in paths], transforms, repeat, eps) for params in grid]
+    if workers == 1:
+        return [_evaluate(j) for j in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_evaluate, jobs))
+
+def write_table(rows: list[dict], path) -> None:
+    # .parquet needs pandas + pyarrow; anything else is written as CSV
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix.lower() == ".parquet":
+        try:
+            import pandas as pd
+        except ImportError as e:
+            raise ImportError("writing .parquet needs `pandas` (and `pyarrow`)") from e
+        pd.DataFrame(rows, columns=COLUMNS).to_parquet(path, index=False)
+        return
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def fastest_meeting(rows: list[dict], floor: float) -> dict | None:
+    ok = [r for r in rows if r["repeatability"] >= floor]
+    return min(ok, key=lambda r: r["extract_ms"]) if ok else None
+
+def main():
+    # parse command line arguments
+    ap = argparse.ArgumentParser(description="Grid-search SIFT parameters for speed and repeatability")
+    ap.add_argument("--images", nargs="+", default=[str(IMAGES_DIR / "example-image.jpg")])
+    ap.add_argument("--contrast", type=float, nargs="+", default=[0.02, 0.04, 0.1], help="contrastThreshold values")
+    ap.add_argument("--edge", type=float, nargs="+", default=[5, 10], help="edgeThreshold values")
+    ap.add_argument("--layers", type=int, nargs="+", default=[3], help="nOctaveLayers values")
+    ap.add_argument("--sigma", type=float, nargs="+", default=[1.6], help="sigma values")
+    ap.add_argument("--nfeatures", type=int, nargs="+", default=[0], help="nfeatures values (0 = all)")
+    ap.add_argument("--eps", type=float, default=2.5, help="repeatability radius in px (default: 2.5)")
+    ap.add_argument("--repeat", type=int, default=3, help="timing repeats, best is kept (default: 3)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count(), help="processes (default: all cores)")
+    ap.add_argument("--floor", type=float, default=0.5, help="minimum mean repeatability (default: 0.5)")
+    ap.add_argument("--output", default="sift_tuning.csv", help=".csv or .parquet (default: sift_tuning.csv)")
+    args = ap.parse_args()
+
+    grid = parameter_grid(nfeatures=args.nfeatures, nOctaveLayers=args.layers,
+                          contrastThreshold=args.contrast, edgeThreshold=args.edge, sigma=args.sigma)
+    t0 = time.perf_counter()
+    rows = tune(grid, args.images, TRANSFORMS, args.workers, args.repeat, args.eps)
+    print(f"{len(rows)} settings x {len(args.images)} images x {len(TRANSFORMS)} transforms "
+          f"in {time.perf_counter() - t0:.1f} s")
+
+    print(f"{'contrast':>8} {'edge':>5} {'layers':>6} {'sigma':>5} {'nfeat':>5}  "
+          f"{'kps':>6} {'ms':>7}  {'repeat':>6} {'match':>6} {'worst':>6}")
+    for r in sorted(rows, key=lambda r: r["extract_ms"]):
+        print(f"{r['contrastThreshold']:>8g} {r['edgeThreshold']:>5g} {r['nOctaveLayers']:>6} {r['sigma']:>5g} "
+              f"{r['nfeatures']:>5}  {r['keypoints']:>6.0f} {r['extract_ms']:>7.1f}  {r['repeatability']:>6.3f} "
+              f"{r['matching_score']:>6.3f} {r['worst_repeatability']:>6.3f}")
+    write_table(rows, args.output)
+    print(f"Saved: {args.output}")
+
+    best = fastest_meeting(rows, args.floor)
+    if best is None:
+        print(f"no setting reaches repeatability {args.floor}")
+    else:
+        print(f"fastest with repeatability >= {args.floor}: contrastThreshold={best['contrastThreshold']:g} "
+              f"edgeThreshold={best['edgeThreshold']:g} nOctaveLayers={best['nOctaveLayers']} "
+              f"sigma={best['sigma']:g} nfeatures={best['nfeatures']} ({best['extract_ms']:.1f} ms)")
+
+if __name__ == "__main__":
+    main()
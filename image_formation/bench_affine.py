@@ -0,0 +1,51 @@
+# Benchmark: batch affine warping
+
+import argparse
+import time
+import numpy as np
+import cv2 as cv
+from geometric_transforms import RemapCache, warp_affine_batch, read_bgr, ORIG_PATH
+
+def best_time(fn, repeat):
+    # best-of-n wall time in seconds
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark warp_affine_batch against a warpAffine loop")
+    ap.add_argument("--frames", type=int, default=64, help="frames / matrices per workload (default: 64)")
+    ap.add_argument("--workers", type=int, default=None, help="threads (default: all cores)")
+    ap.add_argument("--repeat", type=int, default=3, help="timing repeats, best is kept (default: 3)")
+    args = ap.parse_args()
+
+    img = read_bgr(ORIG_PATH)
+    h, w = img.shape[:2]
+    n = args.frames
+    M = cv.getRotationMatrix2D((w / 2, h / 2), 20, 0.9)
+    Ms = np.stack([cv.getRotationMatrix2D((w / 2, h / 2), a, 0.9) for a in np.linspace(0, 90, n)])
+    frames = np.stack([img] * n)
+
+    print(f"{n} frames of {w}x{h}x3, workers={args.workers or 'all'}")
+    print(f"{'workload':<10} {'interp':<7} {'loop (ms)':>10} {'batch (ms)':>11} {'maps (ms)':>10}")
+    for interp_name, interp in (("nearest", cv.INTER_NEAREST), ("linear", cv.INTER_LINEAR), ("cubic", cv.INTER_CUBIC)):
+        # same M for every frame: the remap tables are built once and cached
+        cache = RemapCache()
+        loop = best_time(lambda: [cv.warpAffine(f, M, (w, h), flags=interp) for f in frames], args.repeat)
+        batch = best_time(lambda: warp_affine_batch(frames, M, interpolation=interp, workers=args.workers), args.repeat)
+        maps = best_time(lambda: warp_affine_batch(frames, M, interpolation=interp, workers=args.workers,
+                                                   use_maps=True, cache=cache), args.repeat)
+        print(f"{'same-M':<10} {interp_name:<7} {loop * 1e3:>10.1f} {batch * 1e3:>11.1f} {maps * 1e3:>10.1f}")
+
+        # one frame, many M: every table is new, so maps pay their build cost
+        loop = best_time(lambda: [cv.warpAffine(img, m, (w, h), flags=interp) for m in Ms], args.repeat)
+        batch = best_time(lambda: warp_affine_batch(img[None], Ms, interpolation=interp, workers=args.workers), args.repeat)
+        maps = best_time(lambda: warp_affine_batch(img[None], Ms, interpolation=interp, workers=args.workers,
+                                                   use_maps=True, cache=RemapCache(max_entries=n)), args.repeat)
+        print(f"{'varying-M':<10} {interp_name:<7} {loop * 1e3:>10.1f} {batch * 1e3:>11.1f} {maps * 1e3:>10.1f}")
+
+if __name__ == "__main__":
+    main()
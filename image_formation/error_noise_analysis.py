@@ -1,9 +1,16 @@
 # Exercise 4: Noise & Error Analysis
 
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.gridspec as gridspec
 from pathlib import Path
+import sys
+
+# allow `from profiling import span` (the module lives in image_processing)
+sys.path.append(str(Path(__file__).resolve().parent.parent / "image_processing"))
+from profiling import add_profile_argument, setup_profiling, span
 
 # Globals / params
 signal_freq   = 5.0     
@@ -17,22 +24,23 @@ max_signal    =  1.0
 noise_mean = 0.0
 noise_std  = 0.1        # relative to signal magnitude
 
-def mse(a, b):
-    # mean squared error
-    a = np.asarray(a); b = np.asarray(b)
-    return float(np.mean((a - b) ** 2))
+def mse(a, b, axis=None):
+    # mean squared error; a float, or an array when reduced along `axis`
+    d = np.subtract(a, b)
+    m = np.einsum("...i,...i->...", d, d) / d.shape[-1] if axis == -1 else np.mean(d * d, axis=axis)
+    return float(m) if axis is None else m
 
-def rmse(a, b):
+def rmse(a, b, axis=None):
     # root mean squared error
-    return float(np.sqrt(mse(a, b)))
+    m = mse(a, b, axis)
+    return float(np.sqrt(m)) if axis is None else np.sqrt(m)
 
-def psnr(a, b, peak=1.0):
-    # peak signal to noise ratio
-    m = mse(a, b)
-    # avoid div by zero
-    if m == 0:
-        return float("inf")
-    return 10.0 * np.log10((peak ** 2) / m)
+def psnr(a, b, peak=1.0, axis=None):
+    # peak signal to noise ratio (inf where the inputs are identical)
+    m = mse(a, b, axis)
+    with np.errstate(divide="ignore"):
+        p = 10.0 * np.log10((peak ** 2) / np.asarray(m, dtype=np.float64))
+    return float(p) if axis is None else p
 
 def original_signal(t):
     return np.sin(2*np.pi*signal_freq*t)
@@ -52,7 +60,84 @@ def quantize(vals, bits, vmin, vmax):
 
     return q_vals, q_idx
 
+# Monte Carlo results: one row per (noise_std, bits, sampling_freq); every
+# metric has its trial mean and a 95% confidence interval (_lo, _hi)
+_MC_METRICS = [f"{which}_{m}" for which in ("noisy", "quant") for m in ("mse", "rmse", "psnr")]
+MC_DTYPE = np.dtype([("noise_std", "f8"), ("bits", "i4"), ("sampling_freq", "f8"), ("trials", "i8")]
+                    + [(f"{m}{sfx}", "f8") for m in _MC_METRICS for sfx in ("", "_lo", "_hi")])
+
+def _mc_cell(std, fs, bits, trials, batch, seed_seq):
+    # all bit depths for one (noise_std, sampling_freq) cell; trials run in
+    # (batch x samples) blocks and only running sums are kept. Every bit depth
+    # quantizes the same noise realizations (common random numbers).
+    rng = np.random.default_rng(seed_seq)
+    n = int(fs * duration)
+    t_s = np.linspace(0, duration, n, endpoint=False)
+    s_s = original_signal(t_s)
+    mag = np.max(s_s) - np.min(s_s)
+    b = np.asarray(bits)[:, None, None]
+    sums = np.zeros((len(_MC_METRICS), len(bits)))
+    sqs = np.zeros_like(sums)
+    for t0 in range(0, trials, batch):
+        k = min(batch, trials - t0)
+        noisy = np.clip(s_s + rng.normal(noise_mean, std * mag, size=(k, n)), min_signal, max_signal)
+        q_vals, _ = quantize(noisy, b, min_signal, max_signal)           # (bits, k, n)
+        n_mse = mse(noisy, s_s, axis=-1)                                  # (k,)
+        q_mse = mse(q_vals, s_s, axis=-1)                                 # (bits, k)
+        with np.errstate(divide="ignore"):
+            per_trial = [np.broadcast_to(n_mse, q_mse.shape), np.broadcast_to(np.sqrt(n_mse), q_mse.shape),
+                         np.broadcast_to(10.0 * np.log10(max_signal ** 2 / n_mse), q_mse.shape),
+                         q_mse, np.sqrt(q_mse), 10.0 * np.log10(max_signal ** 2 / q_mse)]
+        for i, v in enumerate(per_trial):
+            sums[i] += v.sum(axis=1)
+            sqs[i] += (v * v).sum(axis=1)
+    return sums, sqs
+
+def _mc_chunk(cells):
+    # runs in a pool process: a list of (cell index, args) jobs
+    return [(i, _mc_cell(*job)) for i, job in cells]
+
+def monte_carlo(noise_stds, bits, sampling_freqs, trials=1000, seed=0, workers=1, batch=256,
+                z=1.96) -> np.ndarray:
+    # Repeat the Exercise 4 experiment `trials` times for every grid point and
+    # return MC_DTYPE rows in (noise_std, bits, sampling_freq) C order. Each
+    # (noise_std, sampling_freq) cell gets its own stream spawned from `seed`,
+    # so results don't depend on how cells are split across workers.
+    stds = np.atleast_1d(np.asarray(noise_stds, np.float64))
+    bits = [int(x) for x in np.atleast_1d(bits)]
+    fss = np.atleast_1d(np.asarray(sampling_freqs, np.float64))
+    streams = np.random.SeedSequence(seed).spawn(len(stds) * len(fss))
+    jobs = [(i * len(fss) + j, (std, fs, bits, trials, batch, streams[i * len(fss) + j]))
+            for i, std in enumerate(stds) for j, fs in enumerate(fss)]
+    if workers > 1 and len(jobs) > 1:
+        chunks = [jobs[c::workers] for c in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            done = [r for part in pool.map(_mc_chunk, chunks) for r in part]
+    else:
+        done = _mc_chunk(jobs)
+
+    out = np.zeros((len(stds), len(bits), len(fss)), MC_DTYPE)
+    out["noise_std"] = stds[:, None, None]
+    out["bits"] = np.array(bits)[None, :, None]
+    out["sampling_freq"] = fss[None, None, :]
+    out["trials"] = trials
+    for cell, (sums, sqs) in done:
+        i, j = divmod(cell, len(fss))
+        mean = sums / trials
+        with np.errstate(invalid="ignore"):
+            sd = np.sqrt(np.maximum(sqs / trials - mean ** 2, 0) * trials / max(trials - 1, 1))
+        half = z * sd / np.sqrt(trials)
+        for m, name in enumerate(_MC_METRICS):
+            out[name][i, :, j] = mean[m]
+            out[f"{name}_lo"][i, :, j] = mean[m] - half[m]
+            out[f"{name}_hi"][i, :, j] = mean[m] + half[m]
+    return out.reshape(-1)
+
 def plot_all_one_view(samp_freq_hz: float, bits: int = num_bits):
+    # plotting is optional; the Monte Carlo engine doesn't need matplotlib
+    with span("import matplotlib", "setup"):
+        import matplotlib.pyplot as plt
+        import matplotlib.gridspec as gridspec
 
     # continuous reference
     t_cont = np.linspace(0, duration, 1000, endpoint=False)
@@ -105,7 +190,8 @@ def plot_all_one_view(samp_freq_hz: float, bits: int = num_bits):
     img_dir = Path(__file__).parent / "images"
     img_dir.mkdir(exist_ok=True)
     out = img_dir / f"exercise4_all_{int(samp_freq_hz)}Hz_{bits}bits.png"
-    fig.savefig(out, dpi=200)
+    with span("savefig", "encode"):
+        fig.savefig(out, dpi=200)
 
 
     # metrics vs clean sampled signal
@@ -115,11 +201,43 @@ def plot_all_one_view(samp_freq_hz: float, bits: int = num_bits):
     # quantized vs clean
     print("Quant vs clean:   MSE={:.5f}  RMSE={:.5f}  PSNR={:.2f} dB" .format(mse(q_vals, s_s), rmse(q_vals, s_s), psnr(q_vals, s_s, peak=max_signal)))
 
-    plt.show()
+    with span("plt.show", "display"):
+        plt.show()
 
-# replace your main() with:
 def main():
-    plot_all_one_view(sampling_freq, num_bits)
+    # parse command line arguments
+    ap = argparse.ArgumentParser(description="Exercise 4: noise & error analysis")
+    ap.add_argument("--mc", action="store_true", help="Monte Carlo over a grid instead of one plotted run")
+    ap.add_argument("--trials", type=int, default=1000, help="mc: trials per grid point (default: 1000)")
+    ap.add_argument("--noise-stds", type=float, nargs="+", default=[0.05, 0.1, 0.2], help="mc: noise std values")
+    ap.add_argument("--bits", type=int, nargs="+", default=[2, 3, 4, 6, 8], help="mc: bit depths")
+    ap.add_argument("--fs", type=float, nargs="+", default=[8.0, 16.0, 32.0], help="mc: sampling frequencies")
+    ap.add_argument("--workers", type=int, default=os.cpu_count(), help="mc: processes (default: all cores)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--output", help="mc: save the results array as .npy")
+    add_profile_argument(ap)
+    args = ap.parse_args()
+    setup_profiling(args)
+
+    if not args.mc:
+        with span("plot_all_one_view"):
+            plot_all_one_view(sampling_freq, num_bits)
+        return
+
+    t0 = time.perf_counter()
+    with span("monte_carlo"):
+        res = monte_carlo(args.noise_stds, args.bits, args.fs, args.trials, args.seed, args.workers)
+    print(f"{len(res)} grid points x {args.trials} trials in {time.perf_counter() - t0:.2f} s")
+    print(f"{'std':>5} {'bits':>4} {'fs':>6}   {'noisy PSNR (95% CI)':>24}   {'quant PSNR (95% CI)':>24}")
+    for r in res:
+        print(f"{r['noise_std']:>5g} {r['bits']:>4} {r['sampling_freq']:>6g}   "
+              f"{r['noisy_psnr']:>7.2f} [{r['noisy_psnr_lo']:>6.2f}, {r['noisy_psnr_hi']:>6.2f}]   "
+              f"{r['quant_psnr']:>7.2f} [{r['quant_psnr_lo']:>6.2f}, {r['quant_psnr_hi']:>6.2f}]")
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with span("np.save", "encode"):
+            np.save(args.output, res)
+        print(f"Saved: {args.output}")
 
 if __name__ == "__main__":
     main()
@@ -1,9 +1,18 @@
 # Exercise 1: Affine Transformation
 
+import argparse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+import os
 import numpy as np
 import cv2 as cv
 import matplotlib.pyplot as plt
+import sys
+
+# allow `from profiling import span` (the module lives in image_processing)
+sys.path.append(str(Path(__file__).resolve().parent.parent / "image_processing"))
+from profiling import add_profile_argument, setup_profiling, span
 
 # Paths to images
 IMAGES_DIR = Path(__file__).parent / "images"
@@ -33,10 +42,100 @@ def apply_affine(orig_bgr, src_pts, dst_pts):
     warped = cv.warpAffine(orig_bgr, M, (w, h), flags=cv.INTER_LINEAR, borderMode=cv.BORDER_CONSTANT)
     return warped, M
 
+class RemapCache:
+    # LRU cache of fixed-point remap tables keyed by (M, size, interpolation)
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._maps = OrderedDict()
+
+    def get(self, M, size, interpolation=cv.INTER_LINEAR):
+        M = np.asarray(M, dtype=np.float64)
+        key = (M.tobytes(), tuple(size), interpolation)
+        maps = self._maps.get(key)
+        if maps is not None:
+            self._maps.move_to_end(key)
+            self.hits += 1
+            return maps
+        self.misses += 1
+        maps = affine_maps(M, size, interpolation)
+        self._maps[key] = maps
+        if len(self._maps) > self.max_entries:
+            self._maps.popitem(last=False)  # drop least recently used
+        return maps
+
+def affine_maps(M, size, interpolation=cv.INTER_LINEAR):
+    # per-pixel source coordinates of warpAffine(M), packed by cv.convertMaps
+    w, h = size
+    Mi = cv.invertAffineTransform(np.asarray(M, dtype=np.float64))
+    x = np.arange(w, dtype=np.float64)[None, :]
+    y = np.arange(h, dtype=np.float64)[:, None]
+    map_x = (Mi[0, 0] * x + Mi[0, 1] * y + Mi[0, 2]).astype(np.float32)
+    map_y = (Mi[1, 0] * x + Mi[1, 1] * y + Mi[1, 2]).astype(np.float32)
+    return cv.convertMaps(map_x, map_y, cv.CV_16SC2,
+                          nninterpolation=interpolation == cv.INTER_NEAREST)
+
+_REMAP_CACHE = RemapCache()
+
+def warp_affine_batch(images, Ms, size=None, interpolation=cv.INTER_LINEAR,
+                      workers=None, use_maps=False, cache=None, gray_stack=False):
+    # Warp a stack of images and/or a stack of 2x3 matrices. images always
+    # has a leading stack axis; pass a single frame as img[None]:
+    #   images (N,H,W[,C]) + one M  -> same transform for every frame
+    #   images (1,H,W[,C]) + Ms (N,2,3) -> many transforms of one frame
+    #   images (N,...) + Ms (N,2,3) -> pairwise
+    # A 3-D array whose last axis is 1, 3 or 4 could be one color frame, so it
+    # is only taken as an (N,H,W) grayscale stack with gray_stack=True.
+    # Frames run on a thread pool (cv2 releases the GIL). With use_maps the
+    # warp goes through cached cv.remap tables instead of cv.warpAffine.
+    Ms = np.asarray(Ms, dtype=np.float64).reshape(-1, 2, 3)
+    images = np.asarray(images)
+    if images.ndim not in (3, 4):
+        raise ValueError("images must be a (N,H,W) or (N,H,W,C) stack; pass one frame as img[None]")
+    if images.ndim == 3 and images.shape[2] in (1, 3, 4) and not gray_stack:
+        raise ValueError(f"ambiguous images shape {images.shape}: pass one color frame as img[None], "
+                         "or gray_stack=True for an (N,H,W) grayscale stack")
+    n = max(len(images), len(Ms))
+    if len(images) not in (1, n) or len(Ms) not in (1, n):
+        raise ValueError("images and Ms must have the same count, or one of them must be single")
+
+    h, w = images.shape[1:3]
+    size = tuple(size) if size is not None else (w, h)
+    out = np.empty((n, size[1], size[0]) + images.shape[3:], dtype=images.dtype)
+    cache = cache if cache is not None else _REMAP_CACHE
+    # look tables up once, before the threads start, so a new M isn't built twice
+    maps = [cache.get(M, size, interpolation) for M in Ms] if use_maps else None
+
+    def warp(i):
+        img = images[i if len(images) > 1 else 0]
+        M = Ms[i if len(Ms) > 1 else 0]
+        if use_maps:
+            map1, map2 = maps[i if len(Ms) > 1 else 0]
+            cv.remap(img, map1, map2, interpolation, dst=out[i], borderMode=cv.BORDER_CONSTANT)
+        else:
+            cv.warpAffine(img, M, size, dst=out[i], flags=interpolation, borderMode=cv.BORDER_CONSTANT)
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or n == 1:
+        for i in range(n):
+            warp(i)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(warp, range(n)))
+    return out
+
 def main():
+    # parse command line arguments (only --profile; the exercise is fixed)
+    ap = argparse.ArgumentParser(description="Exercise 1: affine transformation")
+    add_profile_argument(ap)
+    args = ap.parse_args()
+    setup_profiling(args)
+
     # Load images
-    orig_bgr = read_bgr(ORIG_PATH)
-    targ_bgr = read_bgr(TARG_PATH)
+    with span("imread", "decode"):
+        orig_bgr = read_bgr(ORIG_PATH)
+        targ_bgr = read_bgr(TARG_PATH)
 
     # Hard-coded pts: order TopLeft, TopRight, OtherPoint
     src_pts = np.float32([
@@ -51,7 +150,8 @@ def main():
     ])
 
     # Apply affine transform
-    affine_bgr, M = apply_affine(orig_bgr, src_pts, dst_pts)
+    with span("apply_affine"):
+        affine_bgr, M = apply_affine(orig_bgr, src_pts, dst_pts)
 
     # Convert for display
     orig_rgb   = bgr_to_rgb(orig_bgr)
@@ -68,10 +168,12 @@ def main():
     img_dir = Path(__file__).parent / "images"
     img_dir.mkdir(exist_ok=True)
     out = img_dir / f"exercise1_all_images.png"
-    fig.savefig(out, dpi=200)
+    with span("savefig", "encode"):
+        fig.savefig(out, dpi=200)
     
     plt.tight_layout(); 
-    plt.show()
+    with span("plt.show", "display"):
+        plt.show()
 
 # Run the main function
 if __name__ == "__main__":
@@ -1,13 +1,46 @@
 # Exercise 2: Thin lens & f-numbers
 
+import argparse
+import time
 from pathlib import Path
 import numpy as np
-import matplotlib.pyplot as plt
+import sys
+
+# allow `from profiling import span` (the module lives in image_processing)
+sys.path.append(str(Path(__file__).resolve().parent.parent / "image_processing"))
+from profiling import add_profile_argument, setup_profiling, span
 
 # image folder path (same as in Exercise 1)
 IMAGES_DIR = Path(__file__).parent / "images"
 IMAGES_DIR.mkdir(exist_ok=True)  # make sure folder exists
 
+# lens catalog: one row per real lens, shared by the plots, the printout and the tables
+LENS_DTYPE = np.dtype([("name", "U16"), ("f_mm", "f8"), ("N", "f8")])
+LENSES = np.array([
+    ("24mm f/1.4", 24.0, 1.4),
+    ("50mm f/1.8", 50.0, 1.8),
+    ("70mm f/2.8", 70.0, 2.8),
+    ("200mm f/2.8", 200.0, 2.8),
+    ("400mm f/2.8", 400.0, 2.8),
+    ("600mm f/4.0", 600.0, 4.0),
+], LENS_DTYPE)
+
+# circle of confusion for depth of field (full-frame convention)
+COC_MM = 0.03
+
+# one row per (f, N, Zo) combination; derived fields are masked where the
+# configuration is invalid (f <= 0 or N <= 0, and Zo <= f for the fields
+# that depend on Zo)
+OPTICS_DTYPE = np.dtype([
+    ("f_mm", "f8"), ("N", "f8"), ("zo_mm", "f8"),
+    ("zi_mm", "f8"), ("aperture_mm", "f8"), ("magnification", "f8"),
+    ("hyperfocal_mm", "f8"), ("near_mm", "f8"), ("far_mm", "f8"), ("dof_mm", "f8"),
+])
+_MASK_DTYPE = np.dtype([(name, "?") for name in OPTICS_DTYPE.names])
+_INPUTS = ("f_mm", "N", "zo_mm")
+_ZO_FREE = ("aperture_mm", "hyperfocal_mm")   # valid whenever f, N > 0
+_CHUNK_ROWS = 1 << 14
+
 def thin_lens_zi(f_mm: float, zo_mm: float) -> float:
     # Thin lens formula: 1/f = 1/Zo + 1/Zi
     if zo_mm <= f_mm:
@@ -15,13 +48,105 @@ def thin_lens_zi(f_mm: float, zo_mm: float) -> float:
     # Zi = (f * Zo) / (Zo - f)
     return (f_mm * zo_mm) / (zo_mm - f_mm)
 
+def image_distance(f_mm, zo_mm) -> np.ma.MaskedArray:
+    # array version of thin_lens_zi: broadcasts, and masks Zo <= f instead of raising
+    f, zo = np.broadcast_arrays(np.asarray(f_mm, np.float64), np.asarray(zo_mm, np.float64))
+    bad = ~((zo > f) & (f > 0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.ma.array(f * zo / (zo - f), mask=bad)
+
+def aperture_diameter(f_mm, N) -> np.ma.MaskedArray:
+    # D = f / N, masked where f or N is not positive
+    f, n = np.broadcast_arrays(np.asarray(f_mm, np.float64), np.asarray(N, np.float64))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.ma.array(f / n, mask=~((f > 0) & (n > 0)))
+
+def hyperfocal_distance(f_mm, N, coc_mm: float = COC_MM) -> np.ma.MaskedArray:
+    # H = f^2 / (N c) + f: focused there, everything from H/2 to infinity is sharp
+    f, n = np.broadcast_arrays(np.asarray(f_mm, np.float64), np.asarray(N, np.float64))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.ma.array(f * f / (n * coc_mm) + f, mask=~((f > 0) & (n > 0)))
+
+def depth_of_field(f_mm, N, zo_mm, coc_mm: float = COC_MM):
+    # near / far limits of acceptable sharpness and their difference;
+    # far (and dof) is inf once Zo reaches the hyperfocal distance
+    t = optics_table(f_mm, N, zo_mm, coc_mm)
+    return t["near_mm"], t["far_mm"], t["dof_mm"]
+
+def optics_table(f_mm, N, zo_mm, coc_mm: float = COC_MM) -> np.ma.MaskedArray:
+    # Every broadcast (f, N, Zo) combination in array operations, without
+    # matplotlib. Returns a masked OPTICS_DTYPE array with the broadcast shape;
+    # the input fields are never masked, aperture and hyperfocal distance are
+    # masked where f or N is not positive, and the Zo-dependent fields also
+    # where Zo <= f. e.g. optics_table(LENSES["f_mm"][:, None], LENSES["N"][:, None], zo)
+    # for the catalog lenses, or f[:, None, None], n[None, :, None], zo for a grid.
+    f, n, zo = (np.asarray(a, np.float64) for a in (f_mm, N, zo_mm))
+    shape = np.broadcast_shapes(f.shape, n.shape, zo.shape)
+    size = int(np.prod(shape))
+    # plain (row, field) arrays, viewed as the structured result once at the end
+    rows = np.empty((size, len(OPTICS_DTYPE)))
+    bad = np.empty((size, 2), bool)                      # f or N invalid, any input invalid
+    # nditer hands out chunks of the broadcast inputs in C order; each chunk's
+    # fields are computed as contiguous float rows of a (field, row) scratch
+    # buffer that stays in cache, then transposed into place
+    cols = np.empty((len(OPTICS_DTYPE), min(size, _CHUNK_ROWS)))
+    it = np.nditer([f, n, zo], ["external_loop", "buffered", "zerosize_ok"], [["readonly"]] * 3,
+                   order="C", buffersize=_CHUNK_ROWS)
+    i = 0
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"), it:
+        for fc, nc, zc in it:
+            k = len(fc)
+            f_out, n_out, zo_out, zi, d, m, h, near, far, dof = cols[:, :k]
+            f_out[:], n_out[:], zo_out[:] = fc, nc, zc
+            np.divide(fc, nc, out=d)
+            np.multiply(nc, coc_mm, out=h)
+            np.divide(fc * fc, h, out=h)
+            h += fc                                      # f^2 / (N c) + f
+            zof = zc - fc
+            np.divide(fc, zof, out=m)                    # Zi / Zo
+            np.multiply(m, zc, out=zi)                   # f Zo / (Zo - f)
+            hf = h - fc
+            np.add(hf, zof, out=near)
+            hf *= zc
+            np.divide(hf, near, out=near)                # Zo (H - f) / (H - 2f + Zo)
+            np.subtract(h, zc, out=far)
+            np.divide(hf, far, out=far)                  # Zo (H - f) / (H - Zo)
+            np.copyto(far, np.inf, where=zc >= h)
+            np.subtract(far, near, out=dof)
+            rows[i:i + k] = cols[:, :k].T
+            np.logical_or(fc <= 0, nc <= 0, out=bad[i:i + k, 0])
+            np.logical_or(zof <= 0, bad[i:i + k, 0], out=bad[i:i + k, 1])
+            i += k
+    mask = np.zeros(size, _MASK_DTYPE)
+    for name in OPTICS_DTYPE.names:
+        if name not in _INPUTS:
+            mask[name] = bad[:, 0] if name in _ZO_FREE else bad[:, 1]
+    return np.ma.MaskedArray(rows.view(OPTICS_DTYPE).reshape(shape), mask=mask.reshape(shape),
+                             fill_value=np.full((), np.nan, OPTICS_DTYPE))
+
+def export_table(table: np.ma.MaskedArray, path) -> None:
+    # .npy keeps the structured dtype, anything else is written as CSV;
+    # masked values are written as NaN. No matplotlib involved.
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    flat = np.ma.filled(table, np.full((), np.nan, OPTICS_DTYPE)).reshape(-1)
+    if path.suffix.lower() == ".npy":
+        np.save(path, flat)
+        return
+    cols = np.column_stack([flat[name] for name in OPTICS_DTYPE.names])
+    np.savetxt(path, cols, fmt="%.6g", delimiter=",", header=",".join(OPTICS_DTYPE.names), comments="")
+
 def zi_curve_for_f(f_mm: float):
     # Generate zo values from slightly > f to 10,000 * f
     zo = np.logspace(np.log10(1.1 * f_mm), np.log10(1e4 * f_mm), num=2000)
     zi = (f_mm * zo) / (zo - f_mm)  # vectorized thin lens
     return zo, zi
 
-def plot_both(f_list, f_numbers):
+def plot_both(f_list, f_numbers, lenses=LENSES):
+    # plotting is optional; the tables above don't need matplotlib
+    with span("import matplotlib", "setup"):
+        import matplotlib.pyplot as plt
+
     fig, axes = plt.subplots(1, 2, figsize=(14,6)) # 1 row, 2 columns
 
     # Left: zi vs zo
@@ -55,50 +180,71 @@ def plot_both(f_list, f_numbers):
     ax.grid(True)
     ax.legend()
 
-    # Mark real lenses as points on the lines
-    lenses = [
-        (24, 1.4),
-        (50, 1.8),
-        (70, 2.8),
-        (200, 2.8),
-        (400, 2.8),
-        (600, 4.0),
-    ]
-    # for loop to plot and annotate each lens
-    for f_mm, N in lenses:
-        D = f_mm / N
-        ax.scatter([f_mm], [D], s=20, color="black", zorder=5)
+    # Mark real lenses from the catalog as points on the lines
+    ax.scatter(lenses["f_mm"], aperture_diameter(lenses["f_mm"], lenses["N"]), s=20, color="black", zorder=5)
 
     plt.tight_layout()
     
     # Save the figure in images folder for README
     out_path = IMAGES_DIR / "exercise2_plots.png"
-    plt.savefig(out_path, dpi=200, bbox_inches="tight")
+    with span("savefig", "encode"):
+        plt.savefig(out_path, dpi=200, bbox_inches="tight")
 
-    plt.show()
+    with span("plt.show", "display"):
+        plt.show()
 
-def print_lens_apertures():
+def print_lens_apertures(lenses=LENSES):
     # D = f / N
-    lenses = [
-        ("24mm f/1.4", 24.0, 1.4),
-        ("50mm f/1.8", 50.0, 1.8),
-        ("70mm f/2.8", 70.0, 2.8),
-        ("200mm f/2.8", 200.0, 2.8),
-        ("400mm f/2.8", 400.0, 2.8),
-        ("600mm f/4.0", 600.0, 4.0),
-    ]
-    # Calculate and print aperture diameters
     print("\nAperture diameters (D = f / N):")
     # for loop to print each lens and its aperture diameter
-    for name, f, N in lenses:
-        D = f / N
-        print(f"  {name:<14} -> D = {D:.1f} mm")
+    for lens, D in zip(lenses, aperture_diameter(lenses["f_mm"], lenses["N"])):
+        print(f"  {lens['name']:<14} -> D = {D:.1f} mm")
 
 def main():
+    # parse command line arguments
+    ap = argparse.ArgumentParser(description="Exercise 2: thin lens & f-numbers")
+    ap.add_argument("--table", action="store_true", help="build an optics table instead of plotting")
+    ap.add_argument("--catalog", action="store_true", help="table: catalog lenses only, instead of every f x N")
+    ap.add_argument("--f", type=float, nargs="+", default=None, help="table: focal lengths in mm (default: catalog)")
+    ap.add_argument("--N", type=float, nargs="+", default=None, help="table: f-numbers (default: catalog)")
+    ap.add_argument("--zo-range", type=float, nargs=3, default=[10.0, 1e6, 100000], metavar=("LO", "HI", "NUM"),
+                    help="table: object distances in mm, geomspace(LO, HI, NUM) (default: 10 1e6 100000)")
+    ap.add_argument("--coc", type=float, default=COC_MM, help=f"table: circle of confusion in mm (default: {COC_MM})")
+    ap.add_argument("--output", help="table: save as .npy (structured) or .csv")
+    add_profile_argument(ap)
+    args = ap.parse_args()
+    setup_profiling(args)
+
+    if args.table:
+        lo, hi, num = args.zo_range
+        zo = np.geomspace(lo, hi, int(num))
+        t0 = time.perf_counter()
+        with span("optics_table"):
+            if args.catalog:
+                table = optics_table(LENSES["f_mm"][:, None], LENSES["N"][:, None], zo, args.coc)
+            else:
+                f = np.unique(LENSES["f_mm"]) if args.f is None else np.asarray(args.f)
+                n = np.unique(LENSES["N"]) if args.N is None else np.asarray(args.N)
+                table = optics_table(f[:, None, None], n[None, :, None], zo, args.coc)
+        ms = (time.perf_counter() - t0) * 1e3
+        valid = int((~table.mask["zi_mm"]).sum())
+        print(f"{table.size} rows ({valid} valid) in {ms:.1f} ms")
+        # hyperfocal distance and DOF at 3 m for the catalog lenses
+        at3m = optics_table(LENSES["f_mm"], LENSES["N"], 3000.0, args.coc)
+        for lens, row in zip(LENSES, at3m):
+            print(f"  {lens['name']:<14} H = {row['hyperfocal_mm'] / 1e3:8.2f} m, "
+                  f"DOF at 3 m = {row['dof_mm']:9.1f} mm")
+        if args.output:
+            with span("export_table", "encode"):
+                export_table(table, args.output)
+            print(f"Saved: {args.output}")
+        return
+
     # Focal lengths and f-numbers to plot
     f_list = [3.0, 9.0, 50.0, 200.0]
-    # f-numbers for aperture diameter lines
-    plot_both(f_list, [1.4, 1.8, 2.8, 4.0]) 
+    # f-numbers for aperture diameter lines, from the catalog
+    with span("plot_both"):
+        plot_both(f_list, np.unique(LENSES["N"]).tolist())
     # Print aperture diameters for common lenses
     print_lens_apertures()                  
 
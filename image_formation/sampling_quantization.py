@@ -1,8 +1,14 @@
 # Exercise 3: Sampling & Quantization
 
+import argparse
+import time
 import numpy as np
-import matplotlib.pyplot as plt
 from pathlib import Path
+import sys
+
+# allow `from profiling import span` (the module lives in image_processing)
+sys.path.append(str(Path(__file__).resolve().parent.parent / "image_processing"))
+from profiling import add_profile_argument, setup_profiling, span
 
 # set up paths
 IMG_DIR = Path(__file__).parent / "images"
@@ -30,7 +36,101 @@ def quantize(vals, bits, vmin, vmax):
     
     return q_vals, q_idx
 
+# one row per (signal freq, sampling freq, bits) configuration
+RESULT_DTYPE = np.dtype([
+    ("signal_freq", "f8"), ("sampling_freq", "f8"), ("bits", "i4"), ("n_samples", "i4"),
+    ("aliased", "?"), ("alias_freq", "f8"),            # Nyquist check and apparent frequency
+    ("q_mse", "f8"), ("q_rmse", "f8"), ("q_psnr", "f8"),  # quantized vs clean samples
+    ("r_mse", "f8"), ("r_rmse", "f8"),                  # held staircase vs continuous signal
+])
+
+def simulate(sampling_freqs, bits, signal_freqs=signal_freq, dur=duration, vmin=min_signal, vmax=max_signal,
+             n_cont=1000, max_elems=2 ** 24) -> np.ndarray:
+    # Headless engine: every (signal freq, sampling freq, bits) combination is
+    # sampled, quantized and scored in broadcast array operations, without
+    # matplotlib. Returns a RESULT_DTYPE array in (signal, sampling, bits) C order;
+    # reshape to (len(signal_freqs), len(sampling_freqs), len(bits)) for a grid.
+    sf = np.atleast_1d(np.asarray(signal_freqs, np.float64))
+    fs = np.atleast_1d(np.asarray(sampling_freqs, np.float64))
+    b = np.atleast_1d(np.asarray(bits, np.int64))
+    n = (fs * dur).astype(np.int64)  # samples per sampling frequency, as make_panels_for
+    if (n < 1).any():
+        raise ValueError("every sampling frequency needs at least one sample over the duration")
+    F, S, B = len(sf), len(fs), len(b)
+    out = np.empty((F, S, B), RESULT_DTYPE)
+    out["signal_freq"] = sf[:, None, None]
+    out["sampling_freq"] = fs[None, :, None]
+    out["bits"] = b[None, None, :]
+    out["n_samples"] = n[None, :, None]
+    out["aliased"] = (fs[None, :] < 2 * sf[:, None])[:, :, None]
+    # apparent frequency after sampling: distance to the nearest multiple of fs
+    out["alias_freq"] = np.abs(sf[:, None] - fs[None, :] * np.rint(sf[:, None] / fs[None, :]))[:, :, None]
+
+    t_cont = np.linspace(0, dur, n_cont, endpoint=False)
+    s_cont = np.sin(2 * np.pi * sf[:, None] * t_cont)                       # (F, T)
+    # prefix sums of s and s^2 along the continuous grid, for the staircase error
+    cs1 = np.concatenate([np.zeros((F, 1)), np.cumsum(s_cont, axis=1)], axis=1)
+    cs2 = np.concatenate([np.zeros((F, 1)), np.cumsum(s_cont ** 2, axis=1)], axis=1)
+    # sampling frequencies are processed in chunks so the largest
+    # intermediate, (F, chunk, B, samples), stays under max_elems
+    step = max(1, max_elems // (F * B * int(n.max())))
+    for s0 in range(0, S, step):
+        s1 = min(S, s0 + step)
+        nc = n[s0:s1, None]
+        k = np.arange(nc.max())
+        valid = k < nc                                                     # (C, N) ragged sample counts
+        t_s = np.where(valid, k * (dur / nc), 0.0)                         # linspace(0, dur, n, endpoint=False)
+        s_s = np.sin(2 * np.pi * sf[:, None, None] * t_s)                  # (F, C, N)
+        q, _ = quantize(s_s[:, :, None, :], b[:, None], vmin, vmax)        # (F, C, B, N)
+        q = np.where(valid[:, None, :], q, 0.0)  # padding: q = 0 and s = sin(0) = 0
+        d = q - s_s[:, :, None, :]
+        blk = out[:, s0:s1]
+        blk["q_mse"] = (d * d).sum(-1) / nc
+        # zero-order hold (the plotted staircase): sample k is held over the
+        # continuous points j with k*T <= j*n < (k+1)*T. Expanding
+        # sum_j (q_k - s_j)^2 = cnt*q_k^2 - 2 q_k sum s_j + sum s_j^2 makes the
+        # cost per sample instead of per continuous point.
+        lo = np.minimum(-(-k * n_cont // nc), n_cont)                      # ceil(k*T/n)
+        hi = np.minimum(-(-(k + 1) * n_cont // nc), n_cont)
+        cnt = hi - lo
+        sum1 = np.take(cs1, hi, axis=1) - np.take(cs1, lo, axis=1)          # (F, C, N)
+        sum2 = np.take(cs2, hi, axis=1) - np.take(cs2, lo, axis=1)          # (F, C, N)
+        r = cnt[:, None, :] * q * q - 2 * q * sum1[:, :, None, :] + sum2[:, :, None, :]
+        blk["r_mse"] = r.sum(-1) / n_cont
+    out["q_rmse"] = np.sqrt(out["q_mse"])
+    out["r_rmse"] = np.sqrt(out["r_mse"])
+    with np.errstate(divide="ignore"):
+        out["q_psnr"] = 10.0 * np.log10(max(abs(vmin), abs(vmax)) ** 2 / out["q_mse"])
+    return out.reshape(-1)
+
+def plot_sweep(res: np.ndarray, sig_freq: float, field: str = "r_rmse", out_path=None):
+    # optional consumer of simulate(): heatmap of one metric over sampling freq x bits
+    with span("import matplotlib", "setup"):
+        import matplotlib.pyplot as plt
+
+    sel = res[res["signal_freq"] == sig_freq]
+    fs, bits = np.unique(sel["sampling_freq"]), np.unique(sel["bits"])
+    grid = sel[field].reshape(len(fs), len(bits)).T
+    fig, ax = plt.subplots(figsize=(10, 4))
+    im = ax.imshow(grid, aspect="auto", origin="lower",
+                   extent=[fs[0], fs[-1], bits[0] - 0.5, bits[-1] + 0.5])
+    ax.axvline(2 * sig_freq, color="white", linestyle="--", linewidth=1, label="Nyquist")
+    ax.set_xlabel("Sampling frequency (Hz)"); ax.set_ylabel("Bits")
+    ax.set_title(f"{field} for a {sig_freq:g} Hz signal")
+    ax.legend(loc="upper right")
+    fig.colorbar(im, ax=ax)
+    plt.tight_layout()
+    if out_path:
+        with span("savefig", "encode"):
+            fig.savefig(out_path, dpi=200)
+    with span("plt.show", "display"):
+        plt.show()
+
 def make_panels_for(samp_freq_hz: float, bits: int = num_bits):
+    # plotting is optional; the engine above doesn't need matplotlib
+    with span("import matplotlib", "setup"):
+        import matplotlib.pyplot as plt
+
     # continuous
     t_cont = np.linspace(0, duration, 1000, endpoint=False)
     s_cont = original_signal(t_cont)
@@ -70,12 +170,51 @@ def make_panels_for(samp_freq_hz: float, bits: int = num_bits):
 
     # save figure
     out_path = IMG_DIR / f"exercise3_{int(samp_freq_hz)}Hz_{bits}bits.png"
-    fig.savefig(out_path, dpi=200)
+    with span("savefig", "encode"):
+        fig.savefig(out_path, dpi=200)
     
-    plt.show()
+    with span("plt.show", "display"):
+        plt.show()
 
 def main():
-    make_panels_for(8.0, num_bits)   # reproduce your current result
+    # parse command line arguments
+    ap = argparse.ArgumentParser(description="Exercise 3: sampling & quantization")
+    ap.add_argument("--sweep", action="store_true", help="run the headless engine over a grid instead of plotting")
+    ap.add_argument("--fs-range", type=float, nargs=3, default=[2.0, 64.0, 1000], metavar=("LO", "HI", "NUM"),
+                    help="sweep: sampling frequencies, linspace(LO, HI, NUM) (default: 2 64 1000)")
+    ap.add_argument("--bits", type=int, nargs="+", default=list(range(1, 9)), help="sweep: bit depths (default: 1..8)")
+    ap.add_argument("--signal-freqs", type=float, nargs="+", default=[signal_freq], help="sweep: signal frequencies")
+    ap.add_argument("--output", help="sweep: save the results array as .npy")
+    ap.add_argument("--plot", help="sweep: save a staircase-RMSE heatmap for the first signal frequency here")
+    add_profile_argument(ap)
+    args = ap.parse_args()
+    setup_profiling(args)
+
+    if args.sweep:
+        lo, hi, num = args.fs_range
+        t0 = time.perf_counter()
+        with span("simulate"):
+            res = simulate(np.linspace(lo, hi, int(num)), args.bits, args.signal_freqs)
+        print(f"{len(res)} configurations in {(time.perf_counter() - t0) * 1e3:.1f} ms")
+        # cheapest (fewest samples, then fewest bits) setting whose staircase RMSE is under 0.2
+        for f in args.signal_freqs:
+            ok = res[(res["signal_freq"] == f) & ~res["aliased"] & (res["r_rmse"] < 0.2)]
+            if len(ok):
+                best = ok[np.lexsort((ok["bits"], ok["n_samples"]))][0]
+                print(f"  {f:g} Hz: fs={best['sampling_freq']:.2f} Hz, {best['bits']} bits -> "
+                      f"staircase RMSE {best['r_rmse']:.3f}, quantization PSNR {best['q_psnr']:.1f} dB")
+        if args.output:
+            Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+            with span("np.save", "encode"):
+                np.save(args.output, res)
+            print(f"Saved: {args.output}")
+        if args.plot:
+            with span("plot_sweep"):
+                plot_sweep(res, args.signal_freqs[0], out_path=args.plot)
+        return
+
+    with span("make_panels_for"):
+        make_panels_for(8.0, num_bits)   # reproduce your current result
 
     # Write up conclusions below
     print("\nExercise 3 Conclusions")
@@ -89,4 +228,4 @@ def main():
     print("   - Use more bits (finer quantization)\n")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,131 @@
+import argparse
+import math
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import numpy as np
+import cv2
+import sys
+
+# allow `from equalize_histogram import equalization_lut`
+sys.path.append(str(Path(__file__).parent))
+from equalize_histogram import equalization_lut
+from profiling import add_profile_argument, setup_profiling, span
+
+# output rows interpolated per task
+_BAND_ROWS = 128
+
+def tile_histograms(padded: np.ndarray, tiles: tuple[int, int], pool=None) -> np.ndarray:
+    # (ty, tx, 256) counts; each tile row is one bincount over offset indices
+    ty, tx = tiles
+    th, tw = padded.shape[0] // ty, padded.shape[1] // tx
+    offsets = (np.arange(tx, dtype=np.intp) * 256)[:, None]
+
+    def row_hist(r):
+        band = padded[r * th:(r + 1) * th].reshape(th, tx, tw).transpose(1, 0, 2).reshape(tx, -1)
+        return np.bincount((band + offsets).ravel(), minlength=tx * 256).reshape(tx, 256)
+
+    rows = pool.map(row_hist, range(ty)) if pool else map(row_hist, range(ty))
+    return np.stack(list(rows))
+
+def clip_histograms(hist: np.ndarray, limit: int) -> np.ndarray:
+    # clip every bin at `limit` and spread the excess evenly over all bins
+    excess = np.maximum(hist - limit, 0).sum(axis=-1, keepdims=True)
+    out = np.minimum(hist, limit) + excess // 256
+    # leftover counts go one each to the lowest bins
+    out += np.arange(256) < (excess % 256)
+    return out
+
+def _interpolate_band(x: np.ndarray, luts: np.ndarray, tile_size: tuple[int, int],
+                      out: np.ndarray, y0: int, y1: int) -> None:
+    # bilinear blend of the four nearest tile LUTs for output rows [y0, y1)
+    ty, tx = luts.shape[:2]
+    th, tw = tile_size
+
+    fy = np.arange(y0, y1, dtype=np.float32) / th - 0.5
+    ty1 = np.floor(fy).astype(np.intp)
+    wy = (fy - ty1)[:, None]
+    ty2 = np.minimum(ty1 + 1, ty - 1)
+    ty1 = np.maximum(ty1, 0)
+
+    fx = np.arange(x.shape[1], dtype=np.float32) / tw - 0.5
+    tx1 = np.floor(fx).astype(np.intp)
+    wx = (fx - tx1)[None, :]
+    tx2 = np.minimum(tx1 + 1, tx - 1)
+    tx1 = np.maximum(tx1, 0)
+
+    # blend vertically first: one (tx, 256) row of LUTs per output row,
+    # which leaves two gathers per pixel instead of four
+    lf = luts.astype(np.float32)
+    row_luts = lf[ty1] + wy[:, :, None] * (lf[ty2] - lf[ty1])  # (rows, tx, 256)
+    flat = row_luts.reshape(-1)
+
+    v = x[y0:y1].astype(np.intp)
+    base = (np.arange(y1 - y0, dtype=np.intp) * tx)[:, None]
+    left = flat[(base + tx1) * 256 + v]
+    right = flat[(base + tx2) * 256 + v]
+    out[y0:y1] = np.rint(left + wx * (right - left))
+
+def adaptive_equalize(img: np.ndarray, tiles: tuple[int, int] = (8, 8), clip_limit: float = 2.0,
+                      workers: int = 1) -> np.ndarray:
+    # CLAHE-style equalization: per-tile histograms -> clip -> equalization_lut
+    # per tile -> bilinear interpolation between neighbouring tile LUTs
+    ty, tx = tiles
+    if ty < 1 or tx < 1:
+        raise ValueError("tiles must be positive")
+    x = img if img.dtype == np.uint8 else np.clip(img, 0, 255).astype(np.uint8)
+    H, W = x.shape
+    th, tw = math.ceil(H / ty), math.ceil(W / tx)
+
+    # pad bottom/right so the tiles cover the image exactly
+    padded = x
+    if th * ty != H or tw * tx != W:
+        padded = cv2.copyMakeBorder(x, 0, th * ty - H, 0, tw * tx - W, borderType=cv2.BORDER_REFLECT_101)
+
+    out = np.empty_like(x)
+    pool = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        hist = tile_histograms(padded, tiles, pool)
+        if clip_limit > 0:
+            limit = max(int(clip_limit * th * tw / 256), 1)
+            hist = clip_histograms(hist, limit)
+        luts = equalization_lut(hist)  # (ty, tx, 256) uint8
+
+        bands = [(y0, min(H, y0 + _BAND_ROWS)) for y0 in range(0, H, _BAND_ROWS)]
+        run = lambda b: _interpolate_band(x, luts, (th, tw), out, *b)
+        if pool:
+            list(pool.map(run, bands))
+        else:
+            for b in bands:
+                run(b)
+    finally:
+        if pool:
+            pool.shutdown()
+    return out
+
+def main():
+    # parse command line arguments
+    ap = argparse.ArgumentParser(description="Tiled adaptive histogram equalization (CLAHE-style)")
+    ap.add_argument("--input", required=True, help="path to grayscale image")
+    ap.add_argument("--output", required=True, help="where to save the equalized image")
+    ap.add_argument("--tiles", type=int, nargs=2, default=[8, 8], metavar=("ROWS", "COLS"),
+                    help="tile grid (default: 8 8)")
+    ap.add_argument("--clip", type=float, default=2.0, help="clip limit, 0 disables clipping (default: 2.0)")
+    ap.add_argument("--workers", type=int, default=1, help="threads for tiles and bands (default: 1)")
+    add_profile_argument(ap)
+    args = ap.parse_args()
+    setup_profiling(args)
+
+    with span("imread", "decode"):
+        img = cv2.imread(args.input, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        raise SystemExit(f"Could not read image: {args.input}")
+
+    with span("adaptive_equalization"):
+        out = adaptive_equalize(img, tuple(args.tiles), args.clip, args.workers)
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    with span("imwrite", "encode"):
+        cv2.imwrite(args.output, out)
+    print(f"Saved: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+import argparse
+import ast
+import csv
+import glob
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from pathlib import Path
+import numpy as np
+import cv2
+import sys
+
+# allow sibling imports (contrast_stretch, median_filter, ...)
+sys.path.append(str(Path(__file__).parent))
+from calculate_gradient import calculate_gradient
+from calculate_histogram import calculate_histogram
+from contrast_stretch import contrast_stretch
+from directional_edge_detector import directional_edge_detector
+from equalize_histogram import equalize_histogram
+from median_filter import median_filter
+from sobel_edge_detector import sobel_edge_detector
+from profiling import add_profile_argument, setup_profiling, span
+
+IMAGE_EXTS = {".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp"}
+
+# each op: grayscale uint8 in -> array out (image, or .npy for histogram)
+def _op_gradient(img):
+    mag, _ = calculate_gradient(img, with_angle=False)
+    return cv2.normalize(mag, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+
+def _op_histogram(img, bins=256):
+    counts, _ = calculate_histogram(img, int(bins))
+    return counts
+
+OPS = {
+    "contrast_stretch": (lambda img, rmin=None, rmax=None: contrast_stretch(img, rmin, rmax), ".png"),
+    "equalize_histogram": (lambda img: equalize_histogram(img), ".png"),
+    "median_filter": (lambda img, size=3: median_filter(img, int(size)), ".png"),
+    "sobel_edge_detector": (lambda img, threshold=60.0: sobel_edge_detector(img, threshold), ".png"),
+    "directional_edge_detector": (lambda img, min_deg, max_deg, magth=0.0:
+                                  directional_edge_detector(img, (min_deg, max_deg), magth), ".png"),
+    "calculate_gradient": (_op_gradient, ".png"),
+    "calculate_histogram": (_op_histogram, ".npy"),
+}
+
+def collect_inputs(spec: str) -> list[Path]:
+    # directory, glob pattern, or manifest file (one path per line, # comments)
+    p = Path(spec)
+    if p.is_dir():
+        return sorted(q for q in p.rglob("*") if q.suffix.lower() in IMAGE_EXTS)
+    if p.is_file() and p.suffix.lower() not in IMAGE_EXTS:
+        lines = (ln.strip() for ln in p.read_text().splitlines())
+        paths = [Path(ln) if Path(ln).is_absolute() else p.parent / ln
+                 for ln in lines if ln and not ln.startswith("#")]
+        return list(dict.fromkeys(paths))  # each file once, in manifest order
+    if p.is_file():
+        return [p]
+    return sorted(Path(q) for q in glob.glob(spec, recursive=True))
+
+def input_root(spec: str) -> Path | None:
+    # directory, manifest location or a glob's non-wildcard prefix whose
+    # layout the outputs mirror
+    p = Path(spec)
+    if p.is_dir():
+        return p
+    if p.is_file():
+        return p.parent if p.suffix.lower() not in IMAGE_EXTS else None
+    if glob.has_magic(spec):
+        return Path(*[part for part in itertools.takewhile(lambda q: not glob.has_magic(q), p.parts)])
+    return None
+
+def output_path(src: Path, root: Path | None, out_dir: Path, ext: str) -> Path:
+    # mirror the input tree under out_dir when the inputs share a root
+    rel = src.relative_to(root) if root is not None and src.is_relative_to(root) else Path(src.name)
+    return (out_dir / rel).with_suffix(ext)
+
+def up_to_date(src: Path, dst: Path) -> bool:
+    return dst.exists() and dst.stat().st_mtime >= src.stat().st_mtime
+
+def _read(src: Path):
+    with span("imread", "decode"):
+        return cv2.imread(str(src), cv2.IMREAD_GRAYSCALE)
+
+def _write(dst: Path, out: np.ndarray) -> None:
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    with span("imwrite", "encode"):
+        if dst.suffix == ".npy":
+            np.save(dst, out)
+        elif not cv2.imwrite(str(dst), out):
+            raise OSError(f"Could not write image: {dst}")
+
+def _run_chunk(op: str, params: dict, jobs: list[tuple[Path, Path]]) -> list[tuple]:
+    # worker: decode of the next file and encode of the previous one run on
+    # I/O threads (cv2 releases the GIL) while the current file is computed
+    fn, _ = OPS[op]
+    rows = []
+    with ThreadPoolExecutor(max_workers=2) as io:
+        reading = io.submit(_read, jobs[0][0])
+        writing = []
+        for i, (src, dst) in enumerate(jobs):
+            t0 = time.perf_counter()
+            try:
+                img = reading.result()
+            except Exception:
+                img = None
+            if i + 1 < len(jobs):
+                reading = io.submit(_read, jobs[i + 1][0])
+            if img is None:
+                rows.append((str(src), "error", 0.0, "Could not read image"))
+                continue
+            try:
+                with span(op):
+                    out = fn(img, **params)
+            except Exception as e:
+                rows.append((str(src), "error", time.perf_counter() - t0, f"{type(e).__name__}: {e}"))
+                continue
+            # seconds logged = decode wait + compute; the encode overlaps the next file
+            writing.append((src, time.perf_counter() - t0, io.submit(_write, dst, out)))
+        for src, secs, fut in writing:
+            try:
+                fut.result()
+                rows.append((str(src), "ok", secs, ""))
+            except Exception as e:
+                rows.append((str(src), "error", secs, f"{type(e).__name__}: {e}"))
+    return rows
+
+def run_batch(op: str, inputs: list[Path], out_dir: Path, params: dict | None = None,
+              workers: int = 0, chunk_size: int = 16, force: bool = False,
+              root: Path | None = None) -> list[tuple]:
+    # returns one (path, status, seconds, message) row per input
+    if op not in OPS:
+        raise ValueError(f"unknown op: {op}")
+    params = params or {}
+    _, ext = OPS[op]
+
+    rows, jobs, seen = [], [], {}
+    for src in inputs:
+        dst = output_path(src, root, out_dir, ext)
+        if seen.setdefault(dst, src) != src:
+            raise ValueError(f"{seen[dst]} and {src} would both be written to {dst}")
+        if not force and src.exists() and up_to_date(src, dst):
+            rows.append((str(src), "skipped", 0.0, "up to date"))
+        else:
+            jobs.append((src, dst))
+
+    chunks = [jobs[i:i + chunk_size] for i in range(0, len(jobs), chunk_size)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for chunk in chunks:
+            rows.extend(_run_chunk(op, params, chunk))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futs = [pool.submit(_run_chunk, op, params, chunk) for chunk in chunks]
+            for fut in as_completed(futs):
+                rows.extend(fut.result())
+    # chunks finish in any order; log sorted by input path
+    return sorted(rows, key=lambda r: r[0])
+
+def _parse_params(items: list[str]) -> dict:
+    # ["size=5", "threshold=30"] -> {"size": 5, "threshold": 30}
+    params = {}
+    for item in items:
+        key, _, val = item.partition("=")
+        try:
+            params[key] = ast.literal_eval(val)
+        except (ValueError, SyntaxError):
+            params[key] = val
+    return params
+
+def main():
+    # parse command line arguments
+    ap = argparse.ArgumentParser(description="Run one image_processing operator over many images")
+    ap.add_argument("op", choices=sorted(OPS), help="operator to run")
+    ap.add_argument("--inputs", required=True, help="directory, glob pattern (quote it) or manifest file")
+    ap.add_argument("--out-dir", required=True, help="where to write results (input tree is mirrored)")
+    ap.add_argument("--param", action="append", default=[],
+                    help="operator argument as key=value, repeatable (e.g. --param size=5)")
+    ap.add_argument("--workers", type=int, default=0, help="worker processes, 0 = all cores (default: 0)")
+    ap.add_argument("--chunk-size", type=int, default=16, help="files per dispatched task (default: 16)")
+    ap.add_argument("--force", action="store_true", help="recompute outputs that are already up to date")
+    ap.add_argument("--log", help="per-file CSV log (default: <out-dir>/batch_log.csv)")
+    add_profile_argument(ap)
+    args = ap.parse_args()
+    setup_profiling(args)
+
+    inputs = collect_inputs(args.inputs)
+    if not inputs:
+        raise SystemExit(f"No inputs matched: {args.inputs}")
+    root = input_root(args.inputs)
+    out_dir = Path(args.out_dir)
+
+    t0 = time.perf_counter()
+    # with worker processes only this outer span is recorded; --workers 1
+    # shows per-file decode / compute / encode (decode and encode on I/O threads)
+    with span("run_batch"):
+        try:
+            rows = run_batch(args.op, inputs, out_dir, _parse_params(args.param),
+                             args.workers, args.chunk_size, args.force, root)
+        except ValueError as e:
+            raise SystemExit(str(e))
+    elapsed = time.perf_counter() - t0
+
+    log_path = Path(args.log) if args.log else out_dir / "batch_log.csv"
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(log_path, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["path", "status", "seconds", "message"])
+        w.writerows(rows)
+
+    n_ok = sum(r[1] == "ok" for r in rows)
+    n_skip = sum(r[1] == "skipped" for r in rows)
+    n_err = sum(r[1] == "error" for r in rows)
+    rate = n_ok / elapsed if elapsed > 0 else 0.0
+    print(f"{n_ok} ok, {n_skip} skipped, {n_err} failed in {elapsed:.2f}s ({rate:.1f} images/sec)")
+    print(f"Saved log: {log_path}")
+
+if __name__ == "__main__":
+    main()
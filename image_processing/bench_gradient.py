@@ -0,0 +1,58 @@
+import argparse
+import time
+import tracemalloc
+from pathlib import Path
+import numpy as np
+import sys
+
+# allow `from calculate_gradient import calculate_gradient`
+sys.path.append(str(Path(__file__).parent))
+from calculate_gradient import calculate_gradient
+
+def measure(fn, repeat: int):
+    # best-of-n latency (s) and peak traced allocation (bytes) of one call
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+def main():
+    # compare the original two-pass gradient with the fused separable kernel
+    ap = argparse.ArgumentParser(description="Benchmark calculate_gradient modes")
+    ap.add_argument("--sizes", default="640x480,1920x1080,4000x3000",
+                    help="comma-separated WxH synthetic image sizes")
+    ap.add_argument("--repeat", type=int, default=5, help="timing repeats, best is kept (default: 5)")
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'size':>10}  {'mode':<22}  {'time (ms)':>9}  {'peak (MB)':>9}")
+    for wh in args.sizes.split(","):
+        w, h = (int(v) for v in wh.split("x"))
+        img = rng.integers(0, 256, size=(h, w), dtype=np.uint8)
+        mag_buf = np.empty((h, w), dtype=np.float32)
+        ang_buf = np.empty((h, w), dtype=np.float32)
+
+        modes = {
+            "original": lambda: calculate_gradient(img, fused=False),
+            "fused": lambda: calculate_gradient(img),
+            "fused + out buffers": lambda: calculate_gradient(img, mag_out=mag_buf, ang_out=ang_buf),
+            "fused, magnitude only": lambda: calculate_gradient(img, with_angle=False, mag_out=mag_buf),
+        }
+        base_t, base_peak = None, None
+        for name, fn in modes.items():
+            t, peak = measure(fn, args.repeat)
+            if base_t is None:
+                base_t, base_peak = t, peak
+                extra = ""
+            else:
+                extra = f"  ({base_t / t:.2f}x faster, {100 * (1 - peak / base_peak):.0f}% less memory)"
+            print(f"{wh:>10}  {name:<22}  {t * 1e3:>9.2f}  {peak / 2**20:>9.1f}{extra}")
+
+if __name__ == "__main__":
+    main()
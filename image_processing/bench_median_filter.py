@@ -0,0 +1,78 @@
+import argparse
+import os
+import time
+from pathlib import Path
+import numpy as np
+import sys
+
+# allow `from median_filter import median_filter`
+sys.path.append(str(Path(__file__).parent))
+from median_filter import median_filter
+
+def best_time(fn, repeat: int) -> float:
+    # best-of-n wall time in seconds
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def main():
+    # compare the per-pixel loop against the fast engines
+    ap = argparse.ArgumentParser(description="Benchmark median filter engines")
+    ap.add_argument("--height", type=int, default=128, help="synthetic image height (default: 128)")
+    ap.add_argument("--width", type=int, default=128, help="synthetic image width (default: 128)")
+    ap.add_argument("--sizes", default="3,5,7,9,11,15,21,31", help="comma-separated odd window sizes")
+    ap.add_argument("--repeat", type=int, default=3, help="timing repeats, best is kept (default: 3)")
+    ap.add_argument("--skip-loop", action="store_true", help="skip the slow per-pixel reference loop")
+    ap.add_argument("--scaling", action="store_true",
+                    help="instead, time tiled execution for 1..N workers against the serial path")
+    ap.add_argument("--max-workers", type=int, default=os.cpu_count() or 1,
+                    help="largest worker count for --scaling (default: all cores)")
+    ap.add_argument("--tile-rows", type=int, default=256, help="strip height for --scaling (default: 256)")
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    img = rng.integers(0, 256, size=(args.height, args.width), dtype=np.uint8)
+    sizes = [int(s) for s in args.sizes.split(",")]
+
+    if args.scaling:
+        scaling(img, sizes, args)
+        return
+
+    print(f"image {args.height}x{args.width}, best of {args.repeat}")
+    print(f"{'size':>4}  {'loop (s)':>10}  {'window (s)':>10}  {'hist (s)':>10}  {'fastest':>9}  {'speedup':>8}")
+    for k in sizes:
+        ref = median_filter(img, k, "loop") if not args.skip_loop else median_filter(img, k, "window")
+        # every engine must match the reference bit-for-bit
+        for m in ("window", "histogram", "auto"):
+            if not np.array_equal(median_filter(img, k, m), ref):
+                raise SystemExit(f"{m} engine differs from reference at size={k}")
+
+        t_loop = best_time(lambda: median_filter(img, k, "loop"), 1) if not args.skip_loop else float("nan")
+        t_win = best_time(lambda: median_filter(img, k, "window"), args.repeat)
+        t_hist = best_time(lambda: median_filter(img, k, "histogram"), args.repeat)
+        fastest = "histogram" if t_hist < t_win else "window"
+        speedup = t_loop / min(t_win, t_hist)
+        print(f"{k:>4}  {t_loop:>10.4f}  {t_win:>10.4f}  {t_hist:>10.4f}  {fastest:>9}  {speedup:>7.1f}x")
+
+def scaling(img: np.ndarray, sizes: list[int], args) -> None:
+    # tiled thread/process execution vs the serial fast path
+    print(f"image {img.shape[0]}x{img.shape[1]}, tile rows {args.tile_rows}, best of {args.repeat}")
+    print(f"{'size':>4}  {'backend':>7}  {'workers':>7}  {'time (s)':>9}  {'speedup':>8}")
+    for k in sizes:
+        ref = median_filter(img, k)
+        t_serial = best_time(lambda: median_filter(img, k), args.repeat)
+        print(f"{k:>4}  {'serial':>7}  {1:>7}  {t_serial:>9.4f}  {1.0:>7.2f}x")
+        for backend in ("thread", "process"):
+            for n in range(1, args.max_workers + 1):
+                run = lambda: median_filter(img, k, workers=n, tile_rows=args.tile_rows, backend=backend)
+                # tiled output must be identical to the serial path
+                if n > 1 and not np.array_equal(run(), ref):
+                    raise SystemExit(f"tiled {backend} output differs at size={k}, workers={n}")
+                t = best_time(run, args.repeat)
+                print(f"{k:>4}  {backend:>7}  {n:>7}  {t:>9.4f}  {t_serial / t:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
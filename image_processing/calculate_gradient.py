@@ -1,7 +1,13 @@
 import argparse
 from pathlib import Path
+from typing import NamedTuple
 import numpy as np
 import cv2
+import sys
+
+# allow `from profiling import span`
+sys.path.append(str(Path(__file__).parent))
+from profiling import add_profile_argument, setup_profiling, span
 
 # 3×3 Sobel kernels
 _SX = np.array([[-1, 0, 1],
@@ -11,46 +17,110 @@ _SY = np.array([[ 1,  2,  1],
                 [ 0,  0,  0],
                 [-1, -2, -1]], dtype=np.float32)
 
+# separable factors: _SX = [1,2,1]^T x [-1,0,1], _SY = [1,0,-1]^T x [1,2,1]
+_SMOOTH = np.array([1, 2, 1], dtype=np.float32)
+_DIFF = np.array([-1, 0, 1], dtype=np.float32)
+_DIFF_Y = np.array([1, 0, -1], dtype=np.float32)
+
 # compute gradient magnitude and angle using Sobel operator
-def calculate_gradient(img: np.ndarray): # img is grayscale, uint8
-    x = img.astype(np.float32)
+def calculate_gradient(img: np.ndarray, fused: bool = True, with_angle: bool = True,
+                       mag_out: np.ndarray | None = None, ang_out: np.ndarray | None = None):
+    # img is grayscale, uint8
+    if fused:
+        return _gradient_fused(img, with_angle, mag_out, ang_out)
+
+    with span("astype float32"):
+        x = img.astype(np.float32)
     # compute gradients
-    gx = cv2.filter2D(x, ddepth=cv2.CV_32F, kernel=_SX, borderType=cv2.BORDER_REFLECT)
-    gy = cv2.filter2D(x, ddepth=cv2.CV_32F, kernel=_SY, borderType=cv2.BORDER_REFLECT)
+    with span("filter2D x2"):
+        gx = cv2.filter2D(x, ddepth=cv2.CV_32F, kernel=_SX, borderType=cv2.BORDER_REFLECT)
+        gy = cv2.filter2D(x, ddepth=cv2.CV_32F, kernel=_SY, borderType=cv2.BORDER_REFLECT)
 
-    mag = cv2.magnitude(gx, gy)  # float32
-    ang = cv2.phase(gx, gy, angleInDegrees=True)  # [0, 360)
-    # fold to [0,180): direction is unsigned
-    ang_deg = np.minimum(ang, 360.0 - ang)
+    with span("magnitude + phase"):
+        mag = cv2.magnitude(gx, gy)  # float32
+        ang = cv2.phase(gx, gy, angleInDegrees=True)  # [0, 360)
+        # fold to [0,180): direction is unsigned
+        ang_deg = np.minimum(ang, 360.0 - ang)
 
     return mag, ang_deg
 
+def _gradient_fused(img: np.ndarray, with_angle: bool,
+                    mag_out: np.ndarray | None, ang_out: np.ndarray | None):
+    # separable Sobel straight from uint8 (no float32 copy of the input);
+    # results go into the caller's buffers when given, and the angle pass
+    # reuses gx as scratch so only gx/gy are allocated per call
+    if img.dtype not in (np.uint8, np.uint16, np.int16, np.float32):
+        with span("astype float32"):
+            img = img.astype(np.float32)  # dtypes sepFilter2D can't read directly
+    with span("sepFilter2D x2"):
+        gx = cv2.sepFilter2D(img, cv2.CV_32F, _DIFF, _SMOOTH, borderType=cv2.BORDER_REFLECT)
+        gy = cv2.sepFilter2D(img, cv2.CV_32F, _SMOOTH, _DIFF_Y, borderType=cv2.BORDER_REFLECT)
+
+    with span("magnitude"):
+        mag = cv2.magnitude(gx, gy, mag_out)  # float32
+    if not with_angle:
+        return mag, None
+
+    with span("phase"):
+        ang = cv2.phase(gx, gy, ang_out, angleInDegrees=True)  # [0, 360)
+        # fold to [0,180) in place: min(ang, 360 - ang)
+        np.subtract(360.0, ang, out=gx)
+        np.minimum(ang, gx, out=ang)
+    return mag, ang
+
+class Gradient(NamedTuple):
+    # everything the edge detectors need from one frame
+    mag: np.ndarray             # float32 magnitude
+    ang_deg: np.ndarray | None  # float32 angle folded to [0,180), None if skipped
+    mag8: np.ndarray            # magnitude min-max normalized to uint8
+
+    @property
+    def nbytes(self) -> int:
+        ang = self.ang_deg.nbytes if self.ang_deg is not None else 0
+        return self.mag.nbytes + ang + self.mag8.nbytes
+
+def compute_gradient(img: np.ndarray, with_angle: bool = True) -> Gradient:
+    # gradient plus normalized magnitude, shareable between detectors
+    with span("calculate_gradient"):
+        mag, ang_deg = calculate_gradient(img, with_angle=with_angle)
+    with span("normalize"):
+        mag8 = cv2.normalize(mag, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+    return Gradient(mag, ang_deg, mag8)
+
 def main():
     # parse command line arguments
     ap = argparse.ArgumentParser(description="Sobel gradient magnitude + angle")
     ap.add_argument("--input", required=True, help="path to grayscale image")
     ap.add_argument("--out-mag", required=True, help="where to save 8-bit magnitude image")
     ap.add_argument("--out-angle", help="optional: save angle visualization (0..180° → 0..255)")
+    add_profile_argument(ap)
     args = ap.parse_args()
+    setup_profiling(args)
 
-    img = cv2.imread(args.input, cv2.IMREAD_GRAYSCALE) # uint8
+    with span("imread", "decode"):
+        img = cv2.imread(args.input, cv2.IMREAD_GRAYSCALE) # uint8
     if img is None:
         raise SystemExit(f"Could not read image: {args.input}")
 
     # compute gradient
-    mag, ang_deg = calculate_gradient(img) # float32
+    with span("calculate_gradient"):
+        mag, ang_deg = calculate_gradient(img) # float32
 
     # save magnitude (scaled to 8-bit)
-    mag8 = cv2.normalize(mag, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
-    Path(args.out-mag).parent.mkdir(parents=True, exist_ok=True)
-    cv2.imwrite(args.out_mag, mag8)
+    with span("normalize"):
+        mag8 = cv2.normalize(mag, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+    Path(args.out_mag).parent.mkdir(parents=True, exist_ok=True)
+    with span("imwrite magnitude", "encode"):
+        cv2.imwrite(args.out_mag, mag8)
     print(f"Saved magnitude: {args.out_mag}")
 
     # optional: save angle visualization
     if args.out_angle:
-        ang8 = (ang_deg * (255.0 / 180.0)).clip(0, 255).astype(np.uint8)
-        Path(args.out_mag).parent.mkdir(parents=True, exist_ok=True)
-        cv2.imwrite(args.out_angle, ang8)
+        with span("scale angle"):
+            ang8 = (ang_deg * (255.0 / 180.0)).clip(0, 255).astype(np.uint8)
+        Path(args.out_angle).parent.mkdir(parents=True, exist_ok=True)
+        with span("imwrite angle", "encode"):
+            cv2.imwrite(args.out_angle, ang8)
         print(f"Saved angle viz: {args.out_angle}")
 
 if __name__ == "__main__":
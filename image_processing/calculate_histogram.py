@@ -1,38 +1,146 @@
 import argparse
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import numpy as np
 import cv2
+import sys
+
+# allow `from profiling import span`
+sys.path.append(str(Path(__file__).parent))
+from profiling import add_profile_argument, setup_profiling, span
+
+# elements per np.bincount call, which copies its input to intp
+_CHUNK_ELEMS = 1 << 22
 
 def calculate_histogram(img: np.ndarray, bins: int = 256):
     if bins <= 0:
         raise ValueError("bins must be positive")
-    # Use [0,256) so that intensity 255 is included in the last bin.
-    counts, _ = np.histogram(img.ravel(), bins=bins, range=(0, 256))
+    if img.dtype == np.uint8:
+        # integer fast path: exact bincount, same counts as the float binning below
+        acc = HistogramAccumulator(bins)
+        acc.update(img)
+        counts = acc.counts
+    else:
+        # Use [0,256) so that intensity 255 is included in the last bin.
+        counts, _ = np.histogram(img.ravel(), bins=bins, range=(0, 256))
     counts = counts.astype(np.int64)
     total = counts.sum()
     dist = counts / total if total > 0 else np.zeros_like(counts, dtype=np.float64)
     return counts, dist
 
+class HistogramAccumulator:
+    # streaming intensity histogram: feed it images, row strips or
+    # memory-mapped arrays, merge partials from workers, then query stats.
+    # levels=256 covers uint8 data, levels=65536 uint16.
+    def __init__(self, bins: int = 256, levels: int = 256):
+        if bins <= 0:
+            raise ValueError("bins must be positive")
+        if levels not in (256, 65536):
+            raise ValueError("levels must be 256 or 65536")
+        self.bins = bins
+        self.levels = levels
+        self.fine = np.zeros(levels, dtype=np.int64)  # always kept per intensity
+
+    @classmethod
+    def from_counts(cls, counts: np.ndarray, bins: int | None = None) -> "HistogramAccumulator":
+        # wrap existing per-level counts (256 or 65536 of them)
+        acc = cls(bins or counts.size, counts.size)
+        acc.fine += counts.astype(np.int64)
+        return acc
+
+    def update(self, data: np.ndarray) -> "HistogramAccumulator":
+        flat = np.asarray(data).reshape(-1)  # a view for contiguous inputs / memmaps
+        for i in range(0, flat.size, _CHUNK_ELEMS):
+            chunk = flat[i:i + _CHUNK_ELEMS]
+            native = np.uint8 if self.levels == 256 else np.uint16
+            if chunk.dtype != np.uint8 and chunk.dtype != native:
+                # like calculate_histogram: values outside [0,levels) are dropped, floats floor
+                chunk = chunk[(chunk >= 0) & (chunk < self.levels)].astype(native)
+            self.fine += np.bincount(chunk, minlength=self.levels)
+        return self
+
+    def merge(self, other: "HistogramAccumulator") -> "HistogramAccumulator":
+        if other.bins != self.bins or other.levels != self.levels:
+            raise ValueError("cannot merge accumulators with different bins or levels")
+        self.fine += other.fine
+        return self
+
+    def __iadd__(self, other: "HistogramAccumulator") -> "HistogramAccumulator":
+        return self.merge(other)
+
+    @property
+    def total(self) -> int:
+        return int(self.fine.sum())
+
+    @property
+    def counts(self) -> np.ndarray:
+        if self.bins == self.levels:
+            return self.fine.copy()
+        # fold intensities into `bins` equal bins over [0,levels)
+        idx = (np.arange(self.levels) * self.bins) // self.levels
+        return np.bincount(idx, weights=self.fine, minlength=self.bins).astype(np.int64)
+
+    def distribution(self) -> np.ndarray:
+        counts = self.counts
+        total = counts.sum()
+        return counts / total if total > 0 else np.zeros_like(counts, dtype=np.float64)
+
+    def cdf(self) -> np.ndarray:
+        total = self.total
+        c = self.counts.cumsum()
+        return c / total if total > 0 else np.zeros_like(c, dtype=np.float64)
+
+    def percentile(self, q):
+        # smallest intensity whose CDF reaches q% (inverted-CDF definition)
+        if self.total == 0:
+            raise ValueError("percentile of an empty histogram")
+        cdf = self.fine.cumsum()
+        target = np.asarray(q, dtype=np.float64) / 100.0 * cdf[-1]
+        return np.searchsorted(cdf, np.maximum(target, 1), side="left")
+
+def _accumulate_files(paths: list[str], bins: int) -> HistogramAccumulator:
+    # worker: one partial accumulator over a share of the inputs
+    acc = HistogramAccumulator(bins)
+    for p in paths:
+        with span("imread", "decode"):
+            img = cv2.imread(p, cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            raise SystemExit(f"Could not read image: {p}")
+        with span("histogram update"):
+            acc.update(img)
+    return acc
+
 def main():
     ap = argparse.ArgumentParser(description="Calculate grayscale histogram")
-    ap.add_argument("--input", required=True, help="path to grayscale image")
+    ap.add_argument("--input", required=True, nargs="+", help="path(s) to grayscale image(s); counts are aggregated")
     ap.add_argument("--bins", type=int, default=256, help="number of bins (default: 256)")
     ap.add_argument("--save", help="optional: path to save counts as .npy")
+    ap.add_argument("--workers", type=int, default=1, help="processes for many inputs (default: 1)")
+    add_profile_argument(ap)
     args = ap.parse_args()
+    setup_profiling(args)
 
-    img = cv2.imread(args.input, cv2.IMREAD_GRAYSCALE)
-    if img is None:
-        raise SystemExit(f"Could not read image: {args.input}")
-
-    counts, dist = calculate_histogram(img, args.bins)
+    if args.workers > 1 and len(args.input) > 1:
+        # each worker builds a partial histogram; the partials merge exactly
+        # (worker-side decode and counting show up as one span here)
+        shares = [args.input[i::args.workers] for i in range(args.workers)]
+        acc = HistogramAccumulator(args.bins)
+        with span(f"histogram x{args.workers} processes"), ProcessPoolExecutor(max_workers=args.workers) as pool:
+            for part in pool.map(_accumulate_files, shares, [args.bins] * len(shares)):
+                acc.merge(part)
+    else:
+        acc = _accumulate_files(args.input, args.bins)
+    counts = acc.counts
 
     # Print a tiny summary
-    print(f"bins={args.bins}, total_pixels={counts.sum()}, min_count={counts.min()}, max_count={counts.max()}")
+    print(f"images={len(args.input)}, bins={args.bins}, total_pixels={counts.sum()}, min_count={counts.min()}, max_count={counts.max()}")
 
     if args.save:
         Path(args.save).parent.mkdir(parents=True, exist_ok=True)
-        np.save(args.save, counts)
-        print(f"Saved counts to {args.save}.npy")
+        with span("np.save", "encode"):
+            np.save(args.save, counts)  # appends .npy when missing
+        saved = args.save if args.save.endswith(".npy") else f"{args.save}.npy"
+        print(f"Saved counts to {saved}")
 
 if __name__ == "__main__":
     main()
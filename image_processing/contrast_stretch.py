@@ -2,32 +2,111 @@ import argparse
 from pathlib import Path
 import numpy as np
 import cv2
+import sys
+
+# allow `from calculate_histogram import HistogramAccumulator`
+sys.path.append(str(Path(__file__).parent))
+from calculate_histogram import HistogramAccumulator
+from profiling import add_profile_argument, setup_profiling, span
+
+def stretch_lut(r_min: float, r_max: float, levels: int = 256) -> np.ndarray:
+    # the linear remap precomputed for every input level (same float32 math)
+    if r_min >= r_max: # check input
+        raise ValueError("r_min must be < r_max")
+    x = np.arange(levels, dtype=np.float32)
+    y = (x - r_min) * (255.0 / (r_max - r_min))
+    return np.clip(y, 0, 255).astype(np.uint8)
+
+def auto_range(img: np.ndarray, low_pct: float = 2.0, high_pct: float = 98.0,
+               stride: int = 4) -> tuple[float, float]:
+    # r_min/r_max from intensity percentiles of a strided subsample
+    sample = img[::stride, ::stride]
+    if img.dtype in (np.uint8, np.uint16):
+        levels = 256 if img.dtype == np.uint8 else 65536
+        acc = HistogramAccumulator(levels, levels).update(sample)
+        r_min, r_max = acc.percentile([low_pct, high_pct])
+    else:
+        r_min, r_max = np.percentile(sample, [low_pct, high_pct])
+    if r_min >= r_max:
+        # flat or saturated sample: no stretch (the identity table for uint8)
+        # rather than a one-level range that blacks out or inverts the image
+        info = np.iinfo(img.dtype) if img.dtype.kind in "ui" else None
+        return (float(info.min), float(info.max)) if info else (0.0, 255.0)
+    return float(r_min), float(r_max)
+
+def contrast_stretch(img: np.ndarray, r_min: float | None = None, r_max: float | None = None,
+                     out: np.ndarray | None = None, low_pct: float = 2.0, high_pct: float = 98.0,
+                     stride: int = 4, per_channel: bool = False) -> np.ndarray: # linear contrast stretch
+    # r_min/r_max of None -> picked from the low/high percentiles;
+    # per_channel picks them separately for each channel of a color image
+    if per_channel and img.ndim == 3:
+        if out is None:
+            out = np.empty(img.shape, dtype=np.uint8)
+        for c in range(img.shape[2]):
+            out[..., c] = contrast_stretch(np.ascontiguousarray(img[..., c]), r_min, r_max,
+                                           None, low_pct, high_pct, stride)
+        return out
+
+    if r_min is None or r_max is None:
+        lo, hi = auto_range(img, low_pct, high_pct, stride)
+        r_min = lo if r_min is None else r_min
+        r_max = hi if r_max is None else r_max
+
+    if img.dtype == np.uint8:
+        # 256-entry table, applied in place when out is img
+        return cv2.LUT(img, stretch_lut(r_min, r_max), out)
+    if img.dtype == np.uint16:
+        lut = stretch_lut(r_min, r_max, 65536)
+        if out is None:
+            return np.take(lut, img)
+        np.take(lut, img, out=out)
+        return out
 
-def contrast_stretch(img: np.ndarray, r_min: float, r_max: float) -> np.ndarray: # linear contrast stretch
     if r_min >= r_max: # check input
         raise ValueError("r_min must be < r_max")
     x = img.astype(np.float32)
     y = (x - r_min) * (255.0 / (r_max - r_min))
     y = np.clip(y, 0, 255).astype(np.uint8)
-    return y
+    if out is None:
+        return y
+    out[...] = y
+    return out
 
 def main():
     # parse command line arguments
     ap = argparse.ArgumentParser(description="Linear contrast stretch")
     ap.add_argument("--input", required=True, help="path to grayscale image")
     ap.add_argument("--output", required=True, help="where to save the result")
-    ap.add_argument("--rmin", type=float, required=True, help="lower input intensity")
-    ap.add_argument("--rmax", type=float, required=True, help="upper input intensity")
+    ap.add_argument("--rmin", type=float, help="lower input intensity (default: auto from --low-pct)")
+    ap.add_argument("--rmax", type=float, help="upper input intensity (default: auto from --high-pct)")
+    ap.add_argument("--low-pct", type=float, default=2.0, help="auto r_min percentile (default: 2)")
+    ap.add_argument("--high-pct", type=float, default=98.0, help="auto r_max percentile (default: 98)")
+    ap.add_argument("--stride", type=int, default=4, help="subsample stride for auto percentiles (default: 4)")
+    ap.add_argument("--color", action="store_true", help="keep color and stretch each channel separately")
+    ap.add_argument("--depth16", action="store_true", help="read 16-bit data unchanged")
+    add_profile_argument(ap)
     args = ap.parse_args()
+    setup_profiling(args)
 
     # read image
-    img = cv2.imread(args.input, cv2.IMREAD_GRAYSCALE)
+    if args.depth16:
+        flags = cv2.IMREAD_UNCHANGED
+    else:
+        flags = cv2.IMREAD_COLOR if args.color else cv2.IMREAD_GRAYSCALE
+    with span("imread", "decode"):
+        img = cv2.imread(args.input, flags)
     if img is None:
         raise SystemExit(f"Could not read image: {args.input}")
+    if img.ndim == 3 and not args.color:
+        with span("cvtColor", "decode"):
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
 
-    out = contrast_stretch(img, args.rmin, args.rmax)
+    with span("contrast_stretch"):
+        out = contrast_stretch(img, args.rmin, args.rmax, None, args.low_pct, args.high_pct,
+                               args.stride, per_channel=args.color)
     Path(args.output).parent.mkdir(parents=True, exist_ok=True)
-    cv2.imwrite(args.output, out)
+    with span("imwrite", "encode"):
+        cv2.imwrite(args.output, out)
     print(f"Saved: {args.output}")
 
 if __name__ == "__main__":
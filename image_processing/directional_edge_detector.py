@@ -4,13 +4,19 @@ import numpy as np
 import cv2
 import sys
 
-# allow: from calculate_gradient import calculate_gradient
+# allow: from calculate_gradient import compute_gradient
 sys.path.append(str(Path(__file__).parent))
-from calculate_gradient import calculate_gradient   # returns (mag, ang_deg)
-
-def directional_edge_detector(img: np.ndarray, direction_range: tuple[float, float], mag_threshold: float = 0.0) -> np.ndarray:
-    mag, ang_deg = calculate_gradient(img)  # mag is float32, ang in degrees [0,180)
-    mag8 = cv2.normalize(mag, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+from calculate_gradient import Gradient, compute_gradient
+from profiling import add_profile_argument, setup_profiling, span
+
+def directional_edge_detector(img: np.ndarray, direction_range: tuple[float, float], mag_threshold: float = 0.0,
+                              grad: Gradient | None = None) -> np.ndarray:
+    # pass `grad` (e.g. from a GradientCache) to reuse a gradient computed with its angle
+    if grad is None:
+        grad = compute_gradient(img)
+    if grad.ang_deg is None:
+        raise ValueError("directional_edge_detector needs a gradient computed with its angle")
+    ang_deg, mag8 = grad.ang_deg, grad.mag8  # ang in degrees [0,180)
 
     lo, hi = direction_range
     # angle mask
@@ -34,16 +40,21 @@ def main():
     ap.add_argument("--max-deg", type=float, required=True, help="max angle (degrees, 0..180)")
     ap.add_argument("--magth", type=float, default=0.0,
                     help="optional magnitude threshold on normalized mag [0..255] (default: 0 — disabled)")
+    add_profile_argument(ap)
     args = ap.parse_args()
+    setup_profiling(args)
 
     # validate angle range
-    img = cv2.imread(args.input, cv2.IMREAD_GRAYSCALE)
+    with span("imread", "decode"):
+        img = cv2.imread(args.input, cv2.IMREAD_GRAYSCALE)
     if img is None:
         raise SystemExit(f"Could not read image: {args.input}")
 
-    out = directional_edge_detector(img, (args.min_deg, args.max_deg), args.magth)
+    with span("directional_edge_detector"):
+        out = directional_edge_detector(img, (args.min_deg, args.max_deg), args.magth)
     Path(args.output).parent.mkdir(parents=True, exist_ok=True)
-    cv2.imwrite(args.output, out)
+    with span("imwrite", "encode"):
+        cv2.imwrite(args.output, out)
     print(f"Saved: {args.output}")
 
 if __name__ == "__main__":
@@ -0,0 +1,98 @@
+import argparse
+from pathlib import Path
+import numpy as np
+import cv2
+import sys
+
+# allow `from calculate_gradient import compute_gradient`
+sys.path.append(str(Path(__file__).parent))
+from calculate_gradient import Gradient, compute_gradient
+from profiling import add_profile_argument, setup_profiling, span
+
+def _finish(mask: np.ndarray, packed: bool) -> np.ndarray:
+    # (P, H, W) bool -> 0/255 uint8 maps, or bits packed along the width
+    if packed:
+        return np.packbits(mask, axis=-1)
+    return mask.view(np.uint8) * np.uint8(255)
+
+def unpack_masks(packed: np.ndarray, width: int) -> np.ndarray:
+    # inverse of packed=True: (P, H, ceil(W/8)) uint8 -> (P, H, W) bool
+    return np.unpackbits(packed, axis=-1, count=width).view(bool)
+
+def sobel_sweep(img: np.ndarray, thresholds, grad: Gradient | None = None,
+                packed: bool = False) -> np.ndarray:
+    # one gradient, one broadcast comparison: result[i] == sobel_edge_detector(img, thresholds[i])
+    if grad is None:
+        grad = compute_gradient(img, with_angle=False)
+    th = np.asarray(thresholds, dtype=np.float64).reshape(-1, 1, 1)
+    return _finish(grad.mag8 >= th, packed)
+
+def directional_sweep(img: np.ndarray, ranges, mag_threshold: float = 0.0,
+                      grad: Gradient | None = None, packed: bool = False) -> np.ndarray:
+    # result[i] == directional_edge_detector(img, ranges[i], mag_threshold)
+    if grad is None:
+        grad = compute_gradient(img)
+    if grad.ang_deg is None:
+        raise ValueError("directional_sweep needs a gradient computed with its angle")
+    rng = np.asarray(ranges, dtype=np.float64).reshape(-1, 2)
+    ang = grad.ang_deg
+    # compare in the angle's own dtype, as the single-range detector does
+    lo = rng[:, 0].astype(ang.dtype).reshape(-1, 1, 1)
+    hi = rng[:, 1].astype(ang.dtype).reshape(-1, 1, 1)
+
+    mask = (ang >= lo) & (ang <= hi)
+    if mag_threshold > 0:
+        mask &= grad.mag8 >= mag_threshold
+    return _finish(mask, packed)
+
+def _parse_ranges(text: str) -> list[tuple[float, float]]:
+    # "40:50,80:100" -> [(40, 50), (80, 100)]
+    out = []
+    for item in text.split(","):
+        lo, hi = item.split(":")
+        out.append((float(lo), float(hi)))
+    return out
+
+def main():
+    # parse command line arguments
+    ap = argparse.ArgumentParser(description="Sweep Sobel thresholds / directional angle ranges into one .npz")
+    ap.add_argument("--input", required=True, help="path to grayscale image")
+    ap.add_argument("--output", required=True, help="where to save the sweep (.npz)")
+    ap.add_argument("--thresholds", help="comma-separated Sobel thresholds on normalized magnitude, e.g. 20,30,60")
+    ap.add_argument("--ranges", help="comma-separated angle ranges lo:hi in degrees, e.g. 0:10,40:50")
+    ap.add_argument("--magth", type=float, default=0.0,
+                    help="magnitude threshold for the directional sweep (default: 0 — disabled)")
+    ap.add_argument("--packed", action="store_true", help="store bit-packed masks instead of 0/255 maps")
+    add_profile_argument(ap)
+    args = ap.parse_args()
+    setup_profiling(args)
+    if not args.thresholds and not args.ranges:
+        raise SystemExit("give --thresholds and/or --ranges")
+
+    with span("imread", "decode"):
+        img = cv2.imread(args.input, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        raise SystemExit(f"Could not read image: {args.input}")
+
+    # one gradient serves every parameter of both sweeps
+    with span("compute_gradient"):
+        grad = compute_gradient(img, with_angle=bool(args.ranges))
+    result = {"shape": np.array(img.shape), "packed": np.array(args.packed)}
+    if args.thresholds:
+        th = [float(t) for t in args.thresholds.split(",")]
+        result["thresholds"] = np.array(th)
+        with span("sobel_sweep"):
+            result["sobel"] = sobel_sweep(img, th, grad, args.packed)
+    if args.ranges:
+        rng = _parse_ranges(args.ranges)
+        result["ranges"] = np.array(rng)
+        with span("directional_sweep"):
+            result["directional"] = directional_sweep(img, rng, args.magth, grad, args.packed)
+
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    with span("savez_compressed", "encode"):
+        np.savez_compressed(args.output, **result)
+    print(f"Saved: {args.output}")
+
+if __name__ == "__main__":
+    main()
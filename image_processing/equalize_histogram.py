@@ -2,38 +2,148 @@ import argparse
 from pathlib import Path
 import numpy as np
 import cv2
+import sys
 
-def equalize_histogram(img: np.ndarray) -> np.ndarray:
-    if img.dtype != np.uint8: # convert to uint8 if needed
-        x = img.astype(np.uint8)
-    else:
-        x = img
+# allow `from calculate_histogram import HistogramAccumulator`
+sys.path.append(str(Path(__file__).parent))
+from calculate_histogram import HistogramAccumulator
+from profiling import add_profile_argument, setup_profiling, span
 
-    hist, _ = np.histogram(x.ravel(), bins=256, range=(0, 256))
-    cdf = hist.cumsum().astype(np.float64)
+def equalization_lut(hist: np.ndarray) -> np.ndarray:
+    # CDF -> remap table; 256 bins give a uint8 LUT, 65536 bins a uint16 one.
+    # Leading axes are independent histograms (e.g. one per tile).
+    levels = hist.shape[-1]
+    cdf = np.cumsum(hist, axis=-1, dtype=np.float64)
     # mask zeros to avoid flat regions dividing by 0
-    cdf_min = cdf[cdf > 0].min() if np.any(cdf > 0) else 0.0
-    cdf_norm = (cdf - cdf_min) / (cdf[-1] - cdf_min) if cdf[-1] > cdf_min else np.zeros_like(cdf)
-    lut = np.clip(np.round(255 * cdf_norm), 0, 255).astype(np.uint8)
+    cdf_min = np.where(cdf > 0, cdf, np.inf).min(axis=-1, keepdims=True)
+    cdf_min[np.isinf(cdf_min)] = 0.0
+    denom = cdf[..., -1:] - cdf_min
+    flat = denom <= 0
+    cdf_norm = np.where(flat, 0.0, (cdf - cdf_min) / np.where(flat, 1.0, denom))
+    out_dtype = np.uint8 if levels <= 256 else np.uint16
+    peak = levels - 1
+    return np.clip(np.round(peak * cdf_norm), 0, peak).astype(out_dtype)
+
+def _as_supported(img: np.ndarray) -> np.ndarray:
+    # uint8 and uint16 are equalized natively; anything else saturates to
+    # uint8 instead of wrapping around as a plain astype would
+    if img.dtype in (np.uint8, np.uint16):
+        return img
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+def image_histogram(img: np.ndarray) -> np.ndarray:
+    # exact counts over every level of the image's dtype (256 or 65536)
+    x = _as_supported(img)
+    levels = 256 if x.dtype == np.uint8 else 65536
+    return HistogramAccumulator(levels, levels).update(x).fine
+
+def apply_lut(img: np.ndarray, lut: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+    x = _as_supported(img)
+    if x.dtype == np.uint8 and lut.dtype == np.uint8 and lut.size == 256:
+        return cv2.LUT(x, lut, out)  # SIMD table remap
+    if lut.size < 65536 and x.dtype == np.uint16:
+        raise ValueError("16-bit images need a 65536-entry LUT")
+    if out is None:
+        return np.take(lut, x)
+    np.take(lut, x, out=out)
+    return out
+
+def equalize_histogram(img: np.ndarray, lut: np.ndarray | None = None) -> np.ndarray:
+    # per-image equalization, or remap with a precomputed (e.g. global) `lut`
+    if lut is None:
+        lut = equalization_lut(image_histogram(img))
+    return apply_lut(img, lut)
+
+def global_lut(images) -> np.ndarray:
+    # one table from the histogram of a whole dataset (all 8-bit or all 16-bit)
+    hist = None
+    for img in images:
+        h = image_histogram(img)
+        if hist is not None and h.size != hist.size:
+            raise ValueError("global_lut needs images of one bit depth")
+        hist = h if hist is None else hist + h
+    if hist is None:
+        raise ValueError("global_lut needs at least one image")
+    return equalization_lut(hist)
 
-    return lut[x]
+def equalize_batch(images, lut: np.ndarray | None = None) -> list[np.ndarray]:
+    # equalize a batch with one shared table (computed from the batch if not given)
+    images = list(images)
+    if lut is None:
+        lut = global_lut(images)
+    return [apply_lut(img, lut) for img in images]
+
+class StreamingEqualizer:
+    # video equalization: the histogram is an exponential moving average over
+    # frames and the LUT is refreshed every `update_every` frames, so other
+    # frames only pay for the remap
+    def __init__(self, decay: float = 0.9, update_every: int = 1):
+        if not 0.0 <= decay < 1.0:
+            raise ValueError("decay must be in [0, 1)")
+        if update_every < 1:
+            raise ValueError("update_every must be >= 1")
+        self.decay = decay
+        self.update_every = update_every
+        self.hist = None
+        self.lut = None
+        self.frames = 0
+
+    def update(self, frame: np.ndarray) -> np.ndarray:
+        h = image_histogram(frame).astype(np.float64)
+        if self.hist is None or self.hist.size != h.size:
+            self.hist = h
+        else:
+            self.hist *= self.decay
+            self.hist += (1.0 - self.decay) * h
+        self.lut = equalization_lut(self.hist)
+        return self.lut
+
+    def __call__(self, frame: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+        if self.lut is None or self.frames % self.update_every == 0:
+            self.update(frame)
+        self.frames += 1
+        return apply_lut(frame, self.lut, out)
 
 def main():
     # parse command line arguments
     ap = argparse.ArgumentParser(description="Histogram equalization (grayscale)")
-    ap.add_argument("--input", required=True, help="path to grayscale image")
-    ap.add_argument("--output", required=True, help="where to save the equalized image")
+    ap.add_argument("--input", required=True, nargs="+", help="path(s) to grayscale image(s)")
+    ap.add_argument("--output", required=True, nargs="+",
+                    help="where to save the equalized image(s), one per input, or one directory for many")
+    ap.add_argument("--global-lut", action="store_true",
+                    help="equalize all inputs with one table built from their combined histogram")
+    ap.add_argument("--depth16", action="store_true", help="read inputs unchanged to keep 16-bit data")
+    add_profile_argument(ap)
     args = ap.parse_args()
+    setup_profiling(args)
 
-    img = cv2.imread(args.input, cv2.IMREAD_GRAYSCALE) # uint8
-    if img is None:
-        raise SystemExit(f"Could not read image: {args.input}") # error
+    flags = cv2.IMREAD_UNCHANGED if args.depth16 else cv2.IMREAD_GRAYSCALE
+    imgs = []
+    for p in args.input:
+        with span("imread", "decode"):
+            img = cv2.imread(p, flags) # uint8 (or uint16 with --depth16)
+        if img is None:
+            raise SystemExit(f"Could not read image: {p}") # error
+        if img.ndim == 3:
+            with span("cvtColor", "decode"):
+                img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        imgs.append(img)
+
+    if len(args.output) == len(args.input):
+        outputs = [Path(o) for o in args.output]
+    elif len(args.output) == 1 and len(args.input) > 1:
+        outputs = [Path(args.output[0]) / Path(p).name for p in args.input]
+    else:
+        raise SystemExit("give one --output per --input, or a single output directory")
 
     # process
-    out = equalize_histogram(img)
-    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
-    cv2.imwrite(args.output, out)
-    print(f"Saved: {args.output}")
+    with span("equalize_batch" if args.global_lut else "equalize_histogram"):
+        outs = equalize_batch(imgs) if args.global_lut else [equalize_histogram(img) for img in imgs]
+    for out_path, out in zip(outputs, outs):
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        with span("imwrite", "encode"):
+            cv2.imwrite(str(out_path), out)
+        print(f"Saved: {out_path}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,196 @@
+import argparse
+from pathlib import Path
+import numpy as np
+import cv2
+import sys
+
+# allow `from median_filter import median_filter` for the CLI example
+sys.path.append(str(Path(__file__).parent))
+from median_filter import median_filter
+from profiling import add_profile_argument, setup_profiling, span
+
+# rows processed per band; bounds the int32/int64 temporaries to band size
+_BAND_ROWS = 256
+
+# SSIM constants (Wang et al. 2004)
+K1, K2 = 0.01, 0.03
+
+def _stack(x: np.ndarray) -> np.ndarray:
+    # (H, W) -> (1, H, W); stacks pass through
+    x = np.asarray(x)
+    if x.dtype not in (np.uint8, np.uint16):
+        raise ValueError(f"expected uint8 or uint16 images, got {x.dtype}")
+    if x.ndim == 2:
+        return x[None]
+    if x.ndim != 3:
+        raise ValueError("expected an (H, W) image or an (N, H, W) stack")
+    return x
+
+def _box_sums(x: np.ndarray, win: int) -> np.ndarray:
+    # sum over every win x win window of (N, h, w) int64 data, via an integral image
+    ii = np.zeros((x.shape[0], x.shape[1] + 1, x.shape[2] + 1), np.int64)
+    np.cumsum(x, axis=1, out=ii[:, 1:, 1:])
+    np.cumsum(ii[:, 1:, 1:], axis=2, out=ii[:, 1:, 1:])
+    return ii[:, win:, win:] - ii[:, :-win, win:] - ii[:, win:, :-win] + ii[:, :-win, :-win]
+
+def _ssim_map(ref: np.ndarray, test: np.ndarray, win: int, data_range: float) -> np.ndarray:
+    # SSIM of every valid win x win window (uniform weights, sample covariance,
+    # i.e. skimage's structural_similarity with a uniform window, cropped to the
+    # windows that fit). Window sums are exact int64; only the final per-window
+    # formula is float.
+    x = ref.astype(np.int64)
+    y = test.astype(np.int64)
+    n = win * win
+    sx, sy = _box_sums(x, win), _box_sums(y, win)
+    sxx, syy, sxy = _box_sums(x * x, win), _box_sums(y * y, win), _box_sums(x * y, win)
+    # n^2 * (co)variance * (n - 1) / n, exact in int64
+    vx = (n * sxx - sx * sx).astype(np.float64)
+    vy = (n * syy - sy * sy).astype(np.float64)
+    cxy = (n * sxy - sx * sy).astype(np.float64)
+    mx, my = sx.astype(np.float64), sy.astype(np.float64)  # n * mean
+    c1 = (K1 * data_range) ** 2 * n * n
+    c2 = (K2 * data_range) ** 2 * n * (n - 1)
+    return ((2 * mx * my + c1) * (2 * cxy + c2)) / ((mx * mx + my * my + c1) * (vx + vy + c2))
+
+class QualityAccumulator:
+    # streaming MSE / RMSE / PSNR / SSIM: feed it (reference, test) pairs of
+    # images, stacks or row bands, merge partials from workers, then query.
+    # A band or tile may carry context: only rows [top, top + rows) and columns
+    # [left, left + cols) are scored, and SSIM counts the windows whose top-left
+    # pixel lies there, so bands from strip_stream.iter_bands(src, band_rows,
+    # halo=win - 1) (or tiles overlapping by win - 1) cover every window once.
+    def __init__(self, win: int = 7, data_range: float | None = None):
+        if win < 2:
+            raise ValueError("win must be at least 2")
+        self.win = win
+        self.data_range = data_range
+        self.sse = 0       # sum of squared differences (exact)
+        self.pixels = 0
+        self.ssim_sum = 0.0
+        self.windows = 0
+
+    def update(self, ref: np.ndarray, test: np.ndarray, top: int = 0, rows: int | None = None,
+               left: int = 0, cols: int | None = None, ssim: bool = True) -> "QualityAccumulator":
+        ref, test = _stack(ref), _stack(test)
+        if ref.shape[1:] != test.shape[1:] or ref.dtype != test.dtype:
+            raise ValueError("reference and test must have the same size and dtype")
+        if len(ref) == 1 and len(test) > 1:
+            ref = np.broadcast_to(ref, test.shape)  # one reference for a whole stack
+        if self.data_range is None:
+            self.data_range = float(np.iinfo(ref.dtype).max)
+        h, w = ref.shape[1:]
+        rows = h - top if rows is None else rows
+        cols = w - left if cols is None else cols
+        x0, x1 = left, left + cols
+        wx = min(x1, w - self.win + 1)  # windows must fit left of the edge
+        sq = np.int64 if ref.dtype == np.uint16 else np.int32  # squared uint16 differences need 64 bits
+        for y0 in range(top, top + rows, _BAND_ROWS):
+            y1 = min(top + rows, y0 + _BAND_ROWS)
+            d = ref[:, y0:y1, x0:x1].astype(sq)
+            d -= test[:, y0:y1, x0:x1]
+            self.sse += int(np.einsum("nij,nij->", d, d, dtype=np.int64))
+            self.pixels += d.size
+            last = min(y1, h - self.win + 1)  # windows must fit below their first row
+            if ssim and last > y0 and wx > x0:
+                ys, xs = slice(y0, last + self.win - 1), slice(x0, wx + self.win - 1)
+                m = _ssim_map(ref[:, ys, xs], test[:, ys, xs], self.win, self.data_range)
+                self.ssim_sum += float(m.sum())
+                self.windows += m.size
+        return self
+
+    def merge(self, other: "QualityAccumulator") -> "QualityAccumulator":
+        if other.win != self.win:
+            raise ValueError("cannot merge accumulators with different windows")
+        self.data_range = self.data_range or other.data_range
+        self.sse += other.sse
+        self.pixels += other.pixels
+        self.ssim_sum += other.ssim_sum
+        self.windows += other.windows
+        return self
+
+    def __iadd__(self, other: "QualityAccumulator") -> "QualityAccumulator":
+        return self.merge(other)
+
+    @property
+    def mse(self) -> float:
+        return self.sse / self.pixels if self.pixels else float("nan")
+
+    @property
+    def rmse(self) -> float:
+        return float(np.sqrt(self.mse))
+
+    @property
+    def psnr(self) -> float:
+        if self.sse == 0:
+            return float("inf")
+        return float(10.0 * np.log10(self.data_range ** 2 / self.mse))
+
+    @property
+    def ssim(self) -> float:
+        return self.ssim_sum / self.windows if self.windows else float("nan")
+
+def _per_image(ref, test, win=7, data_range=None, ssim=True) -> list[QualityAccumulator]:
+    ref, test = _stack(ref), _stack(test)
+    if len(ref) == 1:
+        ref = np.broadcast_to(ref, test.shape)
+    return [QualityAccumulator(win, data_range).update(r, t, ssim=ssim) for r, t in zip(ref, test)]
+
+def _result(values, ndim: int):
+    return values[0] if ndim == 2 else np.array(values)
+
+def mse(ref: np.ndarray, test: np.ndarray):
+    # float for an image pair, (N,) array for stacks (a single reference is broadcast)
+    return _result([a.mse for a in _per_image(ref, test, ssim=False)], np.ndim(test))
+
+def rmse(ref: np.ndarray, test: np.ndarray):
+    return _result([a.rmse for a in _per_image(ref, test, ssim=False)], np.ndim(test))
+
+def psnr(ref: np.ndarray, test: np.ndarray, data_range: float | None = None):
+    # data_range defaults to the dtype's maximum (255 or 65535)
+    return _result([a.psnr for a in _per_image(ref, test, data_range=data_range, ssim=False)], np.ndim(test))
+
+def ssim(ref: np.ndarray, test: np.ndarray, win: int = 7, data_range: float | None = None):
+    # mean SSIM over all win x win windows
+    return _result([a.ssim for a in _per_image(ref, test, win, data_range)], np.ndim(test))
+
+def main():
+    # score images (or median-filtered versions of them) against a reference
+    ap = argparse.ArgumentParser(description="MSE / RMSE / PSNR / SSIM against a reference image")
+    ap.add_argument("--reference", required=True, help="path to the reference grayscale image")
+    ap.add_argument("--input", required=True, nargs="+", help="image(s) to score")
+    ap.add_argument("--median", type=int, nargs="*", default=[],
+                    help="optional: also score median_filter(input, k) for each k")
+    ap.add_argument("--win", type=int, default=7, help="SSIM window (default: 7)")
+    ap.add_argument("--depth16", action="store_true", help="read 16-bit images unchanged")
+    add_profile_argument(ap)
+    args = ap.parse_args()
+    setup_profiling(args)
+
+    flag = cv2.IMREAD_UNCHANGED if args.depth16 else cv2.IMREAD_GRAYSCALE
+    with span("imread", "decode"):
+        ref = cv2.imread(args.reference, flag)
+    if ref is None:
+        raise SystemExit(f"Could not read image: {args.reference}")
+
+    total = QualityAccumulator(args.win)
+    print(f"{'input':<40} {'MSE':>10} {'RMSE':>8} {'PSNR':>8} {'SSIM':>7}")
+    for path in args.input:
+        with span("imread", "decode"):
+            img = cv2.imread(path, flag)
+        if img is None:
+            raise SystemExit(f"Could not read image: {path}")
+        if img.shape != ref.shape:
+            raise SystemExit(f"{path} is {img.shape}, reference is {ref.shape}")
+        variants = [(Path(path).name, img)]
+        with span("median_filter"):
+            variants += [(f"{Path(path).name} median {k}", median_filter(img, k)) for k in args.median]
+        for name, x in variants:
+            with span("metrics"):
+                acc = QualityAccumulator(args.win).update(ref, x)
+            total += acc
+            print(f"{name:<40} {acc.mse:>10.2f} {acc.rmse:>8.3f} {acc.psnr:>8.2f} {acc.ssim:>7.4f}")
+    if len(args.input) + len(args.input) * len(args.median) > 1:
+        print(f"{'(pooled)':<40} {total.mse:>10.2f} {total.rmse:>8.3f} {total.psnr:>8.2f} {total.ssim:>7.4f}")
+
+if __name__ == "__main__":
+    main()
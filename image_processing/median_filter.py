@@ -1,17 +1,40 @@
 import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from multiprocessing import shared_memory
 from pathlib import Path
 import numpy as np
 import cv2
+import sys
 
-def median_filter(img: np.ndarray, size: int = 3) -> np.ndarray:
+# allow `from profiling import span`
+sys.path.append(str(Path(__file__).parent))
+from profiling import add_profile_argument, setup_profiling, span
+
+# kernels at or above this size use the running-histogram engine
+HIST_MIN_SIZE = 13
+# cap on the (rows, W, k*k) window block the sliding-window engine sorts at once
+_WINDOW_BLOCK_BYTES = 64 * 1024 * 1024
+# default strip height for tiled execution
+TILE_ROWS = 256
+
+def median_filter(img: np.ndarray, size: int = 3, method: str = "auto",
+                  workers: int = 1, tile_rows: int = TILE_ROWS, backend: str = "thread",
+                  out: np.ndarray | None = None) -> np.ndarray:
     if size < 1 or size % 2 == 0:
         raise ValueError("size must be an odd integer >= 1") # enforce odd size
+    if method not in ("auto", "window", "histogram", "loop"):
+        raise ValueError("method must be one of: auto, window, histogram, loop")
+    if workers < 0 or tile_rows < 1:
+        raise ValueError("workers must be >= 0 and tile_rows >= 1")
+    if backend not in ("thread", "process"):
+        raise ValueError("backend must be 'thread' or 'process'")
 
-    if img.ndim == 3: 
+    if img.ndim == 3:
         # run per-channel, then merge back
         chans = cv2.split(img)
-        filt = [median_filter(c, size) for c in chans]
-        return cv2.merge(filt)
+        filt = [median_filter(c, size, method, workers, tile_rows, backend) for c in chans]
+        return cv2.merge(filt, out)
 
     # ensure uint8 input for simplicity
     x = img.astype(np.uint8) if img.dtype != np.uint8 else img
@@ -19,9 +42,75 @@ def median_filter(img: np.ndarray, size: int = 3) -> np.ndarray:
     r = k // 2
 
     # pad the input image to handle borders
-    padded = cv2.copyMakeBorder(x, r, r, r, r, borderType=cv2.BORDER_REFLECT)
-    H, W = x.shape
-    out = np.empty_like(x)
+    with span("copyMakeBorder"):
+        padded = cv2.copyMakeBorder(x, r, r, r, r, borderType=cv2.BORDER_REFLECT)
+
+    if method == "auto":
+        method = "histogram" if k >= HIST_MIN_SIZE else "window"
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    if workers > 1 and x.shape[0] > tile_rows:
+        with span(f"median {method} x{workers}"):
+            res = _median_tiled(padded, k, method, workers, tile_rows, backend)
+        if out is None:
+            return res
+        out[...] = res
+        return out
+    with span(f"median {method}"):
+        return _ENGINES[method](padded, k, out)
+
+def _median_tiled(padded: np.ndarray, k: int, method: str, workers: int,
+                  tile_rows: int, backend: str) -> np.ndarray:
+    # split the output into row strips; strip [y0, y1) reads padded rows
+    # [y0, y1 + k - 1), i.e. its own rows plus a size//2 halo on each side
+    H, W = padded.shape[0] - (k - 1), padded.shape[1] - (k - 1)
+    strips = [(y0, min(H, y0 + tile_rows)) for y0 in range(0, H, tile_rows)]
+
+    if backend == "thread":
+        # threads share the arrays directly; the heavy numpy calls release the GIL
+        out = np.empty((H, W), dtype=np.uint8)
+        engine = _ENGINES[method]
+        def run(strip):
+            y0, y1 = strip
+            engine(padded[y0:y1 + k - 1], k, out[y0:y1])
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(run, strips))
+        return out
+
+    # processes attach to shared-memory blocks by name, so only the
+    # strip bounds are pickled, never pixel data
+    shm_in = shared_memory.SharedMemory(create=True, size=padded.nbytes)
+    shm_out = shared_memory.SharedMemory(create=True, size=H * W)
+    try:
+        np.ndarray(padded.shape, dtype=np.uint8, buffer=shm_in.buf)[:] = padded
+        tasks = [(shm_in.name, padded.shape, shm_out.name, (H, W), y0, y1, k, method)
+                 for y0, y1 in strips]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(_median_strip_shm, tasks))
+        return np.ndarray((H, W), dtype=np.uint8, buffer=shm_out.buf).copy()
+    finally:
+        for shm in (shm_in, shm_out):
+            shm.close()
+            shm.unlink()
+
+def _median_strip_shm(task) -> None:
+    # process-pool worker: filter one strip from shared input into shared output
+    in_name, in_shape, out_name, out_shape, y0, y1, k, method = task
+    shm_in = shared_memory.SharedMemory(name=in_name)
+    shm_out = shared_memory.SharedMemory(name=out_name)
+    try:
+        padded = np.ndarray(in_shape, dtype=np.uint8, buffer=shm_in.buf)
+        out = np.ndarray(out_shape, dtype=np.uint8, buffer=shm_out.buf)
+        _ENGINES[method](padded[y0:y1 + k - 1], k, out[y0:y1])
+        del padded, out  # release the buffer views before closing
+    finally:
+        shm_in.close()
+        shm_out.close()
+
+def _median_loop(padded: np.ndarray, k: int, out: np.ndarray | None = None) -> np.ndarray:
+    H, W = padded.shape[0] - (k - 1), padded.shape[1] - (k - 1)
+    if out is None:
+        out = np.empty((H, W), dtype=np.uint8)
 
     # straightforward sliding-window implementation (clear & student-friendly)
     for y in range(H):
@@ -31,23 +120,90 @@ def median_filter(img: np.ndarray, size: int = 3) -> np.ndarray:
 
     return out
 
+def _median_window(padded: np.ndarray, k: int, out: np.ndarray | None = None) -> np.ndarray:
+    # batched median over a strided view of all k×k windows
+    H, W = padded.shape[0] - (k - 1), padded.shape[1] - (k - 1)
+    if out is None:
+        out = np.empty((H, W), dtype=np.uint8)
+    mid = (k * k) // 2  # k*k is odd, so the median is one element
+
+    windows = np.lib.stride_tricks.sliding_window_view(padded, (k, k))
+    # work in row blocks so the copied windows stay bounded in memory
+    rows = max(1, _WINDOW_BLOCK_BYTES // max(1, W * k * k))
+    for y0 in range(0, H, rows):
+        y1 = min(H, y0 + rows)
+        block = windows[y0:y1].reshape(y1 - y0, W, k * k)
+        out[y0:y1] = np.partition(block, mid, axis=-1)[..., mid]
+
+    return out
+
+def _median_histogram(padded: np.ndarray, k: int, out: np.ndarray | None = None) -> np.ndarray:
+    # running-histogram median (Huang / constant-time style):
+    # keep one 256-bin histogram per padded column, slide them down one row
+    # at a time, and sum k neighbouring columns to get each window histogram
+    H, W = padded.shape[0] - (k - 1), padded.shape[1] - (k - 1)
+    Wp = padded.shape[1]
+    if out is None:
+        out = np.empty((H, W), dtype=np.uint8)
+    rank = (k * k) // 2 + 1  # 1-based rank of the median
+    cols = np.arange(Wp)
+    # counts never exceed k*k, so int16 halves the memory traffic for usual sizes
+    dt = np.int16 if k * k < 32768 else np.int32
+
+    # column histograms for the first k rows
+    col_hist = np.zeros((Wp, 256), dtype=dt)
+    for row in padded[:k]:
+        col_hist[cols, row] += 1
+
+    csum = np.zeros((Wp + 1, 256), dtype=dt)
+    for y in range(H):
+        if y > 0:
+            # slide every column histogram down by one row
+            col_hist[cols, padded[y - 1]] -= 1
+            col_hist[cols, padded[y + k - 1]] += 1
+
+        # window histogram for every output column via a prefix sum
+        # (the prefix may wrap around in int16, but the k-wide difference is exact)
+        np.cumsum(col_hist, axis=0, out=csum[1:])
+        win = csum[k:] - csum[:-k]  # (W, 256)
+
+        # median = number of bins whose cumulative count is still below the rank
+        np.cumsum(win, axis=1, out=win)
+        out[y] = (win < rank).sum(axis=1)
+
+    return out
+
+_ENGINES = {"window": _median_window, "histogram": _median_histogram, "loop": _median_loop}
+
 def main():
     # example usage:
     ap = argparse.ArgumentParser(description="Median filter (non-linear)")
     ap.add_argument("--input", required=True, help="path to input image (will be read as grayscale)")
     ap.add_argument("--output", required=True, help="where to save the filtered image")
     ap.add_argument("--size", type=int, default=3, help="odd window size (default: 3)")
+    ap.add_argument("--method", default="auto", choices=["auto", "window", "histogram", "loop"],
+                    help="median engine (default: auto — picked by window size)")
+    ap.add_argument("--workers", type=int, default=1, help="parallel workers, 0 = all cores (default: 1)")
+    ap.add_argument("--tile-rows", type=int, default=TILE_ROWS,
+                    help=f"output rows per parallel strip (default: {TILE_ROWS})")
+    ap.add_argument("--backend", default="thread", choices=["thread", "process"],
+                    help="parallel backend (default: thread)")
+    add_profile_argument(ap)
     args = ap.parse_args()
+    setup_profiling(args)
 
     # read image as grayscale
-    img = cv2.imread(args.input, cv2.IMREAD_GRAYSCALE)
+    with span("imread", "decode"):
+        img = cv2.imread(args.input, cv2.IMREAD_GRAYSCALE)
     if img is None:
         raise SystemExit(f"Could not read image: {args.input}")
 
     # apply median filter
-    out = median_filter(img, args.size)
+    with span("median_filter"):
+        out = median_filter(img, args.size, args.method, args.workers, args.tile_rows, args.backend)
     Path(args.output).parent.mkdir(parents=True, exist_ok=True)
-    cv2.imwrite(args.output, out)
+    with span("imwrite", "encode"):
+        cv2.imwrite(args.output, out)
     print(f"Saved: {args.output}")
 
 if __name__ == "__main__":
@@ -0,0 +1,215 @@
+import argparse
+import time
+from pathlib import Path
+import numpy as np
+import cv2
+import sys
+
+# allow sibling imports (median_filter, contrast_stretch, ...)
+sys.path.append(str(Path(__file__).parent))
+from calculate_gradient import calculate_gradient, compute_gradient
+from calculate_histogram import HistogramAccumulator
+from contrast_stretch import auto_range, stretch_lut
+from directional_edge_detector import directional_edge_detector
+from equalize_histogram import equalization_lut
+from median_filter import median_filter
+from profiling import add_profile_argument, setup_profiling, span
+
+# --- pointwise stages: each one is a 256-entry table, possibly derived from
+# the histogram of its input, so a run of them collapses into one cv2.LUT
+
+class StretchStage:
+    needs_hist = False
+
+    def __init__(self, r_min=None, r_max=None, low_pct=2.0, high_pct=98.0, stride=4):
+        self.r_min, self.r_max = r_min, r_max
+        self.low_pct, self.high_pct, self.stride = low_pct, high_pct, stride
+        self.name = "stretch:auto" if r_min is None else f"stretch:{r_min:g}:{r_max:g}"
+
+    def lut(self, hist: np.ndarray | None, x: np.ndarray, table: np.ndarray) -> np.ndarray:
+        if self.r_min is not None:
+            return stretch_lut(self.r_min, self.r_max)
+        # contrast_stretch's auto mode on this stage's input: its strided
+        # subsample is the subsample of x pushed through the table so far
+        lo, hi = auto_range(table[x[::self.stride, ::self.stride]], self.low_pct, self.high_pct, stride=1)
+        return stretch_lut(lo, hi)
+
+class EqualizeStage:
+    name = "equalize"
+    needs_hist = True
+
+    def lut(self, hist: np.ndarray | None, x: np.ndarray, table: np.ndarray) -> np.ndarray:
+        return equalization_lut(hist)
+
+class ThresholdStage:
+    needs_hist = False
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self.name = f"threshold:{threshold:g}"
+
+    def lut(self, hist: np.ndarray | None, x: np.ndarray, table: np.ndarray) -> np.ndarray:
+        return np.where(np.arange(256) >= self.threshold, 255, 0).astype(np.uint8)
+
+class FusedLutStage:
+    # consecutive pointwise stages composed into one table; each stage's input
+    # histogram is the previous one pushed through the table built so far, and
+    # its input image (needed only as a subsample) is x through that table
+    def __init__(self, stages: list):
+        self.stages = stages
+        self.name = "+".join(s.name for s in stages)
+
+    def run(self, x: np.ndarray, bufs: "BufferPool") -> np.ndarray:
+        hist = None
+        if any(s.needs_hist for s in self.stages):
+            hist = HistogramAccumulator().update(x).fine
+        lut = np.arange(256, dtype=np.uint8)
+        for s in self.stages:
+            step = s.lut(hist, x, lut)
+            lut = step[lut]
+            if hist is not None:
+                hist = np.bincount(step, weights=hist, minlength=256).astype(np.int64)
+        return cv2.LUT(x, lut, bufs.next_u8(x))
+
+# --- neighbourhood stages
+
+class MedianStage:
+    def __init__(self, size: int):
+        self.size = size
+        self.name = f"median:{size}"
+
+    def run(self, x: np.ndarray, bufs: "BufferPool") -> np.ndarray:
+        return median_filter(x, self.size, out=bufs.next_u8(x))
+
+class GradientStage:
+    # normalized 8-bit magnitude, as calculate_gradient.py saves it
+    name = "gradient"
+
+    def run(self, x: np.ndarray, bufs: "BufferPool") -> np.ndarray:
+        f32 = bufs.f32(x.shape)
+        mag, _ = calculate_gradient(x, with_angle=False, mag_out=f32)
+        cv2.normalize(mag, mag, 0, 255, cv2.NORM_MINMAX)
+        out = bufs.next_u8(x)
+        np.copyto(out, mag, casting="unsafe")  # truncates like .astype(np.uint8)
+        return out
+
+class DirectionalStage:
+    def __init__(self, lo: float, hi: float, magth: float = 0.0):
+        self.range, self.magth = (lo, hi), magth
+        self.name = f"directional:{lo:g}:{hi:g}:{magth:g}"
+
+    def run(self, x: np.ndarray, bufs: "BufferPool") -> np.ndarray:
+        return directional_edge_detector(x, self.range, self.magth, grad=compute_gradient(x))
+
+class BufferPool:
+    # two uint8 frames used ping-pong between stages plus one float32 scratch,
+    # reused across stages (and across images of the same size)
+    def __init__(self):
+        self._u8 = []
+        self._f32 = None
+        self._turn = 0
+
+    def next_u8(self, x: np.ndarray) -> np.ndarray:
+        if not self._u8 or self._u8[0].shape != x.shape:
+            self._u8 = [np.empty(x.shape, np.uint8), np.empty(x.shape, np.uint8)]
+        buf = self._u8[self._turn]
+        if buf is x:  # never write a stage's output over its own input
+            self._turn ^= 1
+            buf = self._u8[self._turn]
+        self._turn ^= 1
+        return buf
+
+    def f32(self, shape: tuple) -> np.ndarray:
+        if self._f32 is None or self._f32.shape != shape:
+            self._f32 = np.empty(shape, np.float32)
+        return self._f32
+
+def parse_steps(spec: str) -> list:
+    # "median:3,stretch:auto,sobel:60" -> list of stages (sobel = gradient + threshold)
+    stages = []
+    for item in spec.split(","):
+        name, *args = item.strip().split(":")
+        if name == "median":
+            stages.append(MedianStage(int(args[0]) if args else 3))
+        elif name == "stretch":
+            if not args or args[0] == "auto":
+                stages.append(StretchStage())
+            else:
+                stages.append(StretchStage(float(args[0]), float(args[1])))
+        elif name == "equalize":
+            stages.append(EqualizeStage())
+        elif name == "threshold":
+            stages.append(ThresholdStage(float(args[0])))
+        elif name == "gradient":
+            stages.append(GradientStage())
+        elif name == "sobel":
+            stages += [GradientStage(), ThresholdStage(float(args[0]) if args else 60.0)]
+        elif name == "directional":
+            lo, hi, *rest = (float(a) for a in args)
+            stages.append(DirectionalStage(lo, hi, rest[0] if rest else 0.0))
+        else:
+            raise ValueError(f"unknown step: {name}")
+    return stages
+
+class Pipeline:
+    # lazy chain of stages: nothing runs until run(); runs of pointwise stages
+    # are fused into one table lookup and frames are recycled between stages
+    def __init__(self, steps):
+        stages = parse_steps(steps) if isinstance(steps, str) else list(steps)
+        self.plan = []
+        for s in stages:
+            if hasattr(s, "lut"):
+                if self.plan and isinstance(self.plan[-1], FusedLutStage):
+                    self.plan[-1] = FusedLutStage(self.plan[-1].stages + [s])
+                else:
+                    self.plan.append(FusedLutStage([s]))
+            else:
+                self.plan.append(s)
+        self.timings: list[tuple[str, float]] = []
+        self._bufs = BufferPool()
+
+    def run(self, img: np.ndarray) -> np.ndarray:
+        x = img if img.dtype == np.uint8 else np.clip(img, 0, 255).astype(np.uint8)
+        self.timings = []
+        for stage in self.plan:
+            t0 = time.perf_counter()
+            with span(stage.name):
+                x = stage.run(x, self._bufs)
+            self.timings.append((stage.name, time.perf_counter() - t0))
+        # the result lives in a pooled buffer; copy it so the next run can't overwrite it
+        return x.copy()
+
+    def __call__(self, img: np.ndarray) -> np.ndarray:
+        return self.run(img)
+
+def main():
+    # parse command line arguments
+    ap = argparse.ArgumentParser(description="Run a chain of image_processing steps without intermediate files")
+    ap.add_argument("--input", required=True, help="path to grayscale image")
+    ap.add_argument("--output", required=True, help="where to save the final result")
+    ap.add_argument("--steps", required=True,
+                    help="comma-separated steps, e.g. median:3,stretch:auto,sobel:60 "
+                         "(also stretch:RMIN:RMAX, equalize, threshold:T, gradient, directional:LO:HI[:MAGTH])")
+    ap.add_argument("--timings", action="store_true", help="print per-stage timings")
+    add_profile_argument(ap)
+    args = ap.parse_args()
+    setup_profiling(args)
+
+    with span("imread", "decode"):
+        img = cv2.imread(args.input, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        raise SystemExit(f"Could not read image: {args.input}")
+
+    pipe = Pipeline(args.steps)
+    with span("pipeline"):
+        out = pipe.run(img)
+    if args.timings:
+        for name, secs in pipe.timings:
+            print(f"  {name:<32} {secs * 1e3:8.2f} ms")
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    with span("imwrite", "encode"):
+        cv2.imwrite(args.output, out)
+    print(f"Saved: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+# Per-stage profiling for the CLI entry points: timing spans with traced
+# allocation counters around decode / compute / encode, written as a Chrome
+# trace (chrome://tracing, Perfetto) or a flat summary table.
+# image_formation's scripts import this module from here.
+#
+#   ap = argparse.ArgumentParser(...)
+#   add_profile_argument(ap)
+#   args = ap.parse_args()
+#   setup_profiling(args)
+#   with span("imread", "decode"):
+#       img = cv2.imread(...)
+#
+# Off unless `--profile` is given or CV_PROFILE is set; while off, span()
+# returns one shared no-op context manager, so a span costs a function call.
+
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+# CV_PROFILE=1 (or "summary") prints the table, CV_PROFILE=trace.json writes a trace
+ENV_VAR = "CV_PROFILE"
+_ON = ("1", "true", "yes", "on", "summary")
+_OFF = ("", "0", "false", "no", "off")
+# CV_PROFILE_MEMORY=0 turns the tracemalloc counters off (timings only)
+MEMORY_ENV_VAR = "CV_PROFILE_MEMORY"
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL = _NullSpan()
+
+class _Span:
+    __slots__ = ("profiler", "name", "cat", "start", "mem0", "child_peak")
+
+    def __init__(self, profiler: "Profiler", name: str, cat: str):
+        self.profiler, self.name, self.cat = profiler, name, cat
+
+    def __enter__(self):
+        p = self.profiler
+        stack = p._stack()
+        if p.memory:
+            cur, peak = tracemalloc.get_traced_memory()
+            if stack:  # the parent keeps the peak reached so far before it is reset
+                stack[-1].child_peak = max(stack[-1].child_peak, peak)
+            tracemalloc.reset_peak()
+            self.mem0, self.child_peak = cur, cur
+        stack.append(self)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        p = self.profiler
+        stack = p._stack()
+        stack.pop()
+        alloc = peak = 0
+        if p.memory:
+            cur, top = tracemalloc.get_traced_memory()
+            top = max(top, self.child_peak)
+            alloc, peak = cur - self.mem0, top - self.mem0
+            if stack:
+                stack[-1].child_peak = max(stack[-1].child_peak, top)
+        p._record(self.name, self.cat, self.start, end - self.start, alloc, peak, len(stack))
+        return False
+
+class Profiler:
+    # collects finished spans; thread-safe, nesting is tracked per thread
+    def __init__(self):
+        self.enabled = False
+        self.memory = False
+        self.output = None     # trace path, or None for the summary table
+        self.events = []       # (name, cat, start_ns, dur_ns, alloc, peak, depth, tid)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter_ns()
+
+    def enable(self, output: str | None = None, memory: bool = True) -> None:
+        # output: a .json path for a Chrome trace, None for the summary table
+        self.enabled, self.output = True, output
+        self.memory = memory
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._t0 = time.perf_counter_ns()
+
+    def span(self, name: str, cat: str = "compute"):
+        if not self.enabled:
+            return _NULL
+        return _Span(self, name, cat)
+
+    def _stack(self) -> list:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _record(self, name, cat, start, dur, alloc, peak, depth) -> None:
+        with self._lock:
+            self.events.append((name, cat, start, dur, alloc, peak, depth, threading.get_ident()))
+
+    def summary(self) -> list[dict]:
+        # one row per (category, span name), in order of first appearance;
+        # total wall time is summed over calls, peak is the largest of any call
+        rows = {}
+        for name, cat, _, dur, alloc, peak, depth, _ in sorted(self.events, key=lambda e: e[2]):
+            r = rows.setdefault((cat, name), {"name": name, "cat": cat, "depth": depth, "calls": 0,
+                                              "total_ms": 0.0, "alloc_mb": 0.0, "peak_mb": 0.0})
+            r["calls"] += 1
+            r["total_ms"] += dur / 1e6
+            r["alloc_mb"] += alloc / 2 ** 20
+            r["peak_mb"] = max(r["peak_mb"], peak / 2 ** 20)
+            r["depth"] = min(r["depth"], depth)
+        return list(rows.values())
+
+    def format_summary(self) -> str:
+        rows = self.summary()
+        wall = (time.perf_counter_ns() - self._t0) / 1e6
+        lines = [f"{'span':<32} {'cat':<8} {'calls':>5} {'total ms':>10} {'mean ms':>9} {'%wall':>6}"
+                 + (f" {'alloc MB':>9} {'peak MB':>8}" if self.memory else "")]
+        for r in rows:
+            line = (f"{'  ' * r['depth'] + r['name']:<32} {r['cat']:<8} {r['calls']:>5} {r['total_ms']:>10.2f} "
+                    f"{r['total_ms'] / r['calls']:>9.2f} {100 * r['total_ms'] / wall:>5.1f}%")
+            if self.memory:
+                line += f" {r['alloc_mb']:>9.2f} {r['peak_mb']:>8.2f}"
+            lines.append(line)
+        lines.append(f"{'(wall since enable)':<32} {'':<8} {'':>5} {wall:>10.2f}")
+        return "\n".join(lines)
+
+    def chrome_trace(self) -> dict:
+        # complete ("X") events in microseconds; memory counters go in args
+        pid = os.getpid()
+        events = [{"name": name, "cat": cat, "ph": "X", "ts": (start - self._t0) / 1e3, "dur": dur / 1e3,
+                   "pid": pid, "tid": tid, "args": {"alloc_bytes": alloc, "peak_bytes": peak} if self.memory else {}}
+                  for name, cat, start, dur, alloc, peak, _, tid in self.events]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def report(self) -> None:
+        if not self.enabled:
+            return
+        if self.output:
+            with open(self.output, "w") as f:
+                json.dump(self.chrome_trace(), f)
+            print(f"Saved profile: {self.output}", file=sys.stderr)
+        else:
+            print(self.format_summary(), file=sys.stderr)
+
+PROFILER = Profiler()
+
+def span(name: str, cat: str = "compute"):
+    # `with span("imread", "decode"): ...`; categories used by the CLIs are
+    # decode (reading inputs), compute, encode (writing outputs)
+    return PROFILER.span(name, cat)
+
+def add_profile_argument(ap) -> None:
+    ap.add_argument("--profile", nargs="?", const="summary", default=None, metavar="TRACE.json",
+                    help=f"time decode/compute/encode stages: a summary table on stderr, or a Chrome trace "
+                         f"when a .json path is given (also via {ENV_VAR}=1 or {ENV_VAR}=trace.json)")
+
+def _trace_path(value: str) -> bool:
+    return value.lower().endswith(".json") or any(sep and sep in value for sep in (os.sep, os.altsep))
+
+def setup_profiling(args=None) -> Profiler:
+    # enable from --profile or the environment; the report is written at exit,
+    # so early returns and SystemExit still produce it. Only a .json name or a
+    # path is taken as the trace file; other unknown values are an error for
+    # --profile and a warning (profiling stays off) for CV_PROFILE
+    flag = getattr(args, "profile", None)
+    if PROFILER.enabled:
+        return PROFILER
+    if flag is not None:
+        choice = flag
+        if choice.lower() not in _ON and not _trace_path(choice):
+            raise SystemExit(f"--profile expects no value or a .json trace path, got {choice!r}")
+    else:
+        choice = os.environ.get(ENV_VAR, "")
+        if choice.lower() in _OFF:
+            return PROFILER
+        if choice.lower() not in _ON and not _trace_path(choice):
+            print(f"warning: ignoring {ENV_VAR}={choice!r} (use 1 or a .json trace path)", file=sys.stderr)
+            return PROFILER
+    output = None if choice.lower() in _ON else choice
+    PROFILER.enable(output, memory=os.environ.get(MEMORY_ENV_VAR, "1") != "0")
+    atexit.register(PROFILER.report)
+    return PROFILER
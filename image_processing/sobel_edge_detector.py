@@ -4,14 +4,16 @@ import numpy as np
 import cv2
 import sys
 
-# allow `from calculate_gradient import calculate_gradient`
+# allow `from calculate_gradient import compute_gradient`
 sys.path.append(str(Path(__file__).parent))
-from calculate_gradient import calculate_gradient  # returns (mag, ang_deg)
+from calculate_gradient import Gradient, compute_gradient
+from profiling import add_profile_argument, setup_profiling, span
 
-def sobel_edge_detector(img: np.ndarray, threshold: float) -> np.ndarray:
-    # img is grayscale, uint8
-    mag, _ = calculate_gradient(img)  # float32
-    mag8 = cv2.normalize(mag, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+def sobel_edge_detector(img: np.ndarray, threshold: float, grad: Gradient | None = None) -> np.ndarray:
+    # img is grayscale, uint8; pass `grad` (e.g. from a GradientCache) to reuse a gradient
+    if grad is None:
+        grad = compute_gradient(img, with_angle=False)  # angle skipped
+    mag8 = grad.mag8
     edges = (mag8 >= threshold).astype(np.uint8) * 255
     return edges # binary edge map, uint8
 
@@ -22,16 +24,21 @@ def main():
     ap.add_argument("--output", required=True, help="where to save the binary edge map (PNG/JPG)")
     ap.add_argument("--threshold", type=float, default=60.0,
                     help="threshold on normalized magnitude [0..255] (default: 60)")
+    add_profile_argument(ap)
     args = ap.parse_args()
+    setup_profiling(args)
 
-    img = cv2.imread(args.input, cv2.IMREAD_GRAYSCALE)
+    with span("imread", "decode"):
+        img = cv2.imread(args.input, cv2.IMREAD_GRAYSCALE)
     if img is None:
         raise SystemExit(f"Could not read image: {args.input}")
 
     # process
-    out = sobel_edge_detector(img, args.threshold)
+    with span("sobel_edge_detector"):
+        out = sobel_edge_detector(img, args.threshold)
     Path(args.output).parent.mkdir(parents=True, exist_ok=True)
-    cv2.imwrite(args.output, out)
+    with span("imwrite", "encode"):
+        cv2.imwrite(args.output, out)
     print(f"Saved: {args.output}")
 
 if __name__ == "__main__":
@@ -0,0 +1,192 @@
+import argparse
+from pathlib import Path
+import numpy as np
+import cv2
+import sys
+
+# allow sibling imports (median_filter, calculate_gradient, ...)
+sys.path.append(str(Path(__file__).parent))
+from calculate_gradient import calculate_gradient
+from median_filter import median_filter
+from profiling import add_profile_argument, setup_profiling, span
+
+# --- row-addressable sources / sinks: each read or write maps only the rows it
+# needs and unmaps them again, so resident memory stays at one band
+
+class RowStore:
+    # 2-D array stored row-major at a byte offset in a file (.npy body, raw, TIFF strip data)
+    def __init__(self, path, shape: tuple[int, int], dtype, offset: int = 0):
+        self.path, self.shape, self.dtype, self.offset = str(path), tuple(shape), np.dtype(dtype), offset
+
+    def read(self, y0: int, y1: int) -> np.ndarray:
+        W = self.shape[1]
+        with span("read rows", "decode"):
+            mm = np.memmap(self.path, dtype=self.dtype, mode="r", shape=(y1 - y0, W),
+                           offset=self.offset + y0 * W * self.dtype.itemsize)
+            rows = np.array(mm)
+            del mm
+        return rows
+
+    def write(self, y0: int, rows: np.ndarray) -> None:
+        W = self.shape[1]
+        with span("write rows", "encode"):
+            mm = np.memmap(self.path, dtype=self.dtype, mode="r+", shape=rows.shape,
+                           offset=self.offset + y0 * W * self.dtype.itemsize)
+            mm[:] = rows
+            mm.flush()
+            del mm
+
+class ZarrRows:
+    # tiled / compressed TIFF through tifffile's zarr store: only the tiles
+    # that overlap the requested rows are decoded
+    def __init__(self, path):
+        try:
+            import tifffile
+            import zarr
+        except ImportError as e:
+            raise ImportError("streaming tiled TIFFs needs `tifffile` and `zarr`") from e
+        self._z = zarr.open(tifffile.imread(path, aszarr=True), mode="r")
+        self.shape, self.dtype = tuple(self._z.shape), self._z.dtype
+
+    def read(self, y0: int, y1: int) -> np.ndarray:
+        with span("read tiles", "decode"):
+            return np.asarray(self._z[y0:y1])
+
+def open_source(path, raw_shape=None, raw_dtype="uint8"):
+    p = Path(path)
+    suffix = p.suffix.lower()
+    if suffix == ".npy":
+        mm = np.load(p, mmap_mode="r")  # header only; no pixel pages are touched
+        if mm.ndim != 2 or not mm.flags.c_contiguous:
+            raise ValueError("need a 2-D C-ordered .npy array")
+        store = RowStore(p, mm.shape, mm.dtype, mm.offset)
+        del mm
+        return store
+    if suffix in (".tif", ".tiff"):
+        try:
+            import tifffile
+        except ImportError as e:
+            raise ImportError("streaming TIFFs needs `tifffile`") from e
+        with tifffile.TiffFile(p) as tif:
+            page = tif.pages[0]
+            contig = page.is_contiguous  # (offset, size) in older tifffile, bool in newer
+            if contig and len(page.shape) == 2:
+                # uncompressed strips: read straight from the file
+                offset = contig[0] if isinstance(contig, tuple) else page.dataoffsets[0]
+                return RowStore(p, page.shape, page.dtype, offset)
+        return ZarrRows(p)
+    if raw_shape is None:
+        raise ValueError("raw input needs its shape (H, W)")
+    return RowStore(p, raw_shape, raw_dtype)
+
+def create_sink(path, shape: tuple[int, int], dtype=np.uint8) -> RowStore:
+    # .npy gets a header; anything else is a headerless raw file
+    p = Path(path)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    if p.suffix.lower() == ".npy":
+        mm = np.lib.format.open_memmap(p, mode="w+", dtype=dtype, shape=shape)
+        offset = mm.offset
+        del mm
+        return RowStore(p, shape, dtype, offset)
+    with open(p, "wb") as f:
+        f.truncate(shape[0] * shape[1] * np.dtype(dtype).itemsize)
+    return RowStore(p, shape, dtype)
+
+def iter_bands(src, band_rows: int, halo: int):
+    # yields (y0, y1, block, top): output rows [y0, y1) and the input rows
+    # around them, with up to `halo` extra rows each side; `top` is the
+    # block row of y0. Only the 2*halo rows shared with the next band are
+    # kept between bands; everything else is read once.
+    H = src.shape[0]
+    carry, carry_lo = None, 0
+    for y0 in range(0, H, band_rows):
+        y1 = min(H, y0 + band_rows)
+        lo, hi = max(0, y0 - halo), min(H, y1 + halo)
+        if carry is not None:  # carry holds input rows [carry_lo, carry_lo + len(carry)), carry_lo == lo
+            block = np.concatenate([carry, src.read(carry_lo + len(carry), hi)])
+        else:
+            block = src.read(lo, hi)
+        yield y0, y1, block, y0 - lo
+        carry_lo = max(0, y1 - halo)
+        carry = block[carry_lo - lo:].copy() if halo and hi < H else None
+
+def _norm_params(mn: float, mx: float) -> tuple[np.float32, np.float32]:
+    # cv2.normalize(..., 0, 255, NORM_MINMAX) with a known global min/max
+    scale = 255.0 / (mx - mn) if mx - mn > np.finfo(np.float64).eps else 0.0
+    return np.float32(scale), np.float32(-mn * scale)
+
+def _gradient_mag8(block, scale, shift):
+    mag, _ = calculate_gradient(block, with_angle=False)
+    return (mag * scale + shift).astype(np.uint8)
+
+def _gradient_range(src, band_rows: int) -> tuple[float, float]:
+    # pass 1: global min/max of the gradient magnitude, band by band
+    mn, mx = np.inf, -np.inf
+    for y0, y1, block, top in iter_bands(src, band_rows, 1):
+        with span("gradient range band"):
+            mag, _ = calculate_gradient(block, with_angle=False)
+            core = mag[top:top + (y1 - y0)]
+            mn, mx = min(mn, float(core.min())), max(mx, float(core.max()))
+    return mn, mx
+
+def stream(src, sink: RowStore, op: str, band_rows: int = 256, **params) -> None:
+    # run `op` over src band by band; each band is computed on a block with
+    # enough halo rows that its core rows match the whole-image result
+    if op == "median":
+        size = int(params.get("size", 3))
+        for y0, y1, block, top in iter_bands(src, band_rows, size // 2):
+            with span("median band"):
+                res = median_filter(block, size)
+            sink.write(y0, res[top:top + (y1 - y0)])
+        return
+
+    if op not in ("gradient", "sobel", "directional"):
+        raise ValueError(f"unknown op: {op}")
+    # mag8 is min-max normalized over the whole image, which takes a first pass
+    needs_mag8 = op != "directional" or params.get("magth", 0.0) > 0
+    scale, shift = _norm_params(*_gradient_range(src, band_rows)) if needs_mag8 else (None, None)
+
+    for y0, y1, block, top in iter_bands(src, band_rows, 1):
+        with span(f"{op} band"):
+            if op == "directional":
+                mag, ang = calculate_gradient(block)
+                lo, hi = params["min_deg"], params["max_deg"]
+                mask = (ang >= lo) & (ang <= hi)
+                if needs_mag8:
+                    mask &= (mag * scale + shift).astype(np.uint8) >= params["magth"]
+                res = np.where(mask, 255, 0).astype(np.uint8)
+            else:
+                res = _gradient_mag8(block, scale, shift)
+                if op == "sobel":
+                    res = (res >= params.get("threshold", 60.0)).astype(np.uint8) * 255
+        sink.write(y0, res[top:top + (y1 - y0)])
+
+def main():
+    # parse command line arguments
+    ap = argparse.ArgumentParser(description="Stream a huge grayscale image through an operator in row bands")
+    ap.add_argument("op", choices=["median", "gradient", "sobel", "directional"], help="operator to run")
+    ap.add_argument("--input", required=True, help=".npy, raw (with --shape) or TIFF input")
+    ap.add_argument("--output", required=True, help=".npy or raw output, written band by band")
+    ap.add_argument("--shape", type=int, nargs=2, metavar=("H", "W"), help="shape of a raw input")
+    ap.add_argument("--dtype", default="uint8", help="dtype of a raw input (default: uint8)")
+    ap.add_argument("--band-rows", type=int, default=256, help="output rows per band (default: 256)")
+    ap.add_argument("--size", type=int, default=3, help="median window size (default: 3)")
+    ap.add_argument("--threshold", type=float, default=60.0, help="sobel threshold (default: 60)")
+    ap.add_argument("--min-deg", type=float, help="directional: min angle (degrees)")
+    ap.add_argument("--max-deg", type=float, help="directional: max angle (degrees)")
+    ap.add_argument("--magth", type=float, default=0.0, help="directional: magnitude threshold (default: 0)")
+    add_profile_argument(ap)
+    args = ap.parse_args()
+    setup_profiling(args)
+
+    if args.op == "directional" and (args.min_deg is None or args.max_deg is None):
+        raise SystemExit("directional needs --min-deg and --max-deg")
+    src = open_source(args.input, args.shape, args.dtype)
+    sink = create_sink(args.output, src.shape)
+    with span("stream"):
+        stream(src, sink, args.op, args.band_rows, size=args.size, threshold=args.threshold,
+               min_deg=args.min_deg, max_deg=args.max_deg, magth=args.magth)
+    print(f"Saved: {args.output}")
+
+if __name__ == "__main__":
+    main()